@@ -8,8 +8,14 @@ import sys
 
 try:
     from latextools_utils import is_bib_buffer, is_biblatex_buffer
+    from latextools_utils.buffer_index import (
+        drop_buffer_indexes, get_buffer_index, note_modification
+    )
 except ImportError:
     from .latextools_utils import is_bib_buffer, is_biblatex_buffer
+    from .latextools_utils.buffer_index import (
+        drop_buffer_indexes, get_buffer_index, note_modification
+    )
 
 if sys.version_info > (3, 0):
     strbase = str
@@ -49,6 +55,50 @@ XDATA_REGEX = re.compile(
 # set indicating entries that have their own special handling...
 SPECIAL_ENTRIES = set(['@xdata', '@set'])
 
+# the keys are served from an index of each bib buffer, which only scans
+# the parts of the buffer changed since the last completion request again
+ENTRY_REGEX = re.compile(
+    r'((?!preamble|comment|string)[a-zA-Z]+)\s*\{\s*([^,]+)\b',
+    re.IGNORECASE | re.UNICODE
+)
+
+IDS_REGEX = re.compile(
+    r'\bids\s*=\s*\{([^}]+)\}',
+    re.IGNORECASE | re.UNICODE | re.DOTALL
+)
+
+IDS_KEY_REGEX = re.compile(r'\b([^,]+)\b', re.IGNORECASE | re.UNICODE)
+
+
+def _scan_chunk(chunk):
+    '''
+    returns the entry (type, key) starting the chunk, if any, and the
+    keys of all ids fields in the chunk
+    '''
+    m = ENTRY_REGEX.match(chunk)
+    entry = (u'@' + m.group(1), m.group(2)) if m else None
+
+    # BibLaTeX supports custom user-defined keys specified in the `id` field
+    # TODO: Should probably figure out how to work out the entry-type
+    ids = []
+    for value in IDS_REGEX.findall(chunk):
+        ids.extend(IDS_KEY_REGEX.findall(value))
+
+    return entry, tuple(ids)
+
+
+def _get_entries(results):
+    # the first chunk precedes the first "@", so cannot start an entry
+    return [entry for entry, _ in results[1:] if entry is not None]
+
+
+def _get_ids(results):
+    ids = []
+    for _, chunk_ids in results:
+        ids.extend(chunk_ids)
+    return ids
+
+
 def _get_keys_by_type(view, valid_types):
     if not valid_types:
         return []
@@ -62,38 +112,15 @@ def _get_keys_by_type(view, valid_types):
         def validator(s):
             return s in valid_types
 
-    keys = []
-
-    contents = view.substr(sublime.Region(0, view.size()))
-    for entry_type, key in re.findall(
-        r'(@(?!preamble|comment|string)[a-zA-Z]+)\s*\{\s*([^,]+)\b',
-        contents,
-        re.IGNORECASE | re.UNICODE
-    ):
-        if validator(entry_type):
-            keys.append(key)
+    index = get_buffer_index(view, 'keys', _scan_chunk)
+    return [
+        key for entry_type, key in index.derive('entries', _get_entries)
+        if validator(entry_type)
+    ]
 
-    return keys
-
-# BibLaTeX supports custom user-defined keys specified in the `id` field
 def _get_keys_from_id_field(view):
-    keys = []
-
-    contents = view.substr(sublime.Region(0, view.size()))
-    # TODO: Should probably figure out how to work out the entry-type
-    for ids in re.findall(
-        r'\bids\s*=\s*\{([^}]+)\}',
-        contents,
-        re.IGNORECASE | re.UNICODE | re.DOTALL
-    ):
-        for key in re.findall(
-            r'\b([^,]+)\b',
-            ids,
-            re.IGNORECASE | re.UNICODE
-        ):
-            keys.append(key)
-
-    return keys
+    index = get_buffer_index(view, 'keys', _scan_chunk)
+    return list(index.derive('ids', _get_ids))
 
 def _get_cite_keys_validator(s):
     return s not in SPECIAL_ENTRIES
@@ -108,9 +135,14 @@ def get_xdata_keys(view):
 def get_entryset_keys(view):
     return _get_keys_by_type(view, '@set')
 
+# the number of characters before the cursor searched for the current field;
+# this avoids copying the whole buffer up to the cursor on each keystroke
+MAX_FIELD_LENGTH = 4096
+
 def get_text_to_cursor(view):
     cursor = view.sel()[0].b
-    current_region = sublime.Region(0, cursor)
+    start = view.line(max(0, cursor - MAX_FIELD_LENGTH)).begin()
+    current_region = sublime.Region(start, cursor)
     return view.substr(current_region)
 
 # builds the replacement string depending on the current context of the line
@@ -139,6 +171,12 @@ def get_completions_if_matches(regex, line, get_key_list_func, view):
         return []
 
 class BiblatexCrossrefCompletions(sublime_plugin.EventListener):
+    def on_close(self, view):
+        drop_buffer_indexes(view)
+
+    def on_modified(self, view):
+        note_modification(view)
+
     def on_query_completions(self, view, prefix, locations):
         if not is_bib_buffer(view):
             return []
@@ -5,17 +5,32 @@ from __future__ import print_function
 import sublime
 import sublime_plugin
 
+import os
 import re
 import sys
 
 try:
-    from external.bibtex.names import Name
+    from external.bibtex.names import Name, parse_name
     from external.bibtex.tex import tokenize_list
-    from latextools_utils import is_bib_buffer
+    from latex_cite_completions import find_bib_files
+    from latextools_utils import is_bib_buffer, get_setting
+    from latextools_utils.bibcache import BibCache
+    from latextools_utils.buffer_index import (
+        drop_buffer_indexes, get_buffer_index, note_modification
+    )
+    from latextools_utils.cache import CacheMiss
+    from latextools_utils.tex_directives import get_tex_root
 except ImportError:
-    from .external.bibtex.names import Name
+    from .external.bibtex.names import Name, parse_name
     from .external.bibtex.tex import tokenize_list
-    from .latextools_utils import is_bib_buffer
+    from .latex_cite_completions import find_bib_files
+    from .latextools_utils import is_bib_buffer, get_setting
+    from .latextools_utils.bibcache import BibCache
+    from .latextools_utils.buffer_index import (
+        drop_buffer_indexes, get_buffer_index, note_modification
+    )
+    from .latextools_utils.cache import CacheMiss
+    from .latextools_utils.tex_directives import get_tex_root
 
 if sys.version_info > (3, 0):
     strbase = str
@@ -40,9 +55,14 @@ ON_NAME_FIELD_REGEX = re.compile(
 )
 
 
+# the number of characters before the cursor searched for the current field
+MAX_FIELD_LENGTH = 4096
+
+
 def get_text_to_cursor(view):
     cursor = view.sel()[0].b
-    current_region = sublime.Region(0, cursor)
+    start = view.line(max(0, cursor - MAX_FIELD_LENGTH)).begin()
+    current_region = sublime.Region(start, cursor)
     return view.substr(current_region)
 
 
@@ -78,13 +98,34 @@ NAME_FIELD_REGEX = re.compile(
 
 
 def get_names_from_view(view):
-    contents = view.substr(sublime.Region(0, view.size()))
-    return get_names(contents)
+    u'''
+    Returns a dict mapping each name defined in the bib buffer to the number
+    of times it occurs. The names are kept in an index of the buffer, which
+    only re-parses the entries changed since it was last used.
+    '''
+    index = get_buffer_index(view, 'names', _get_name_list)
+    return index.derive('counts', _count_names)
+
+
+def _count_names(results):
+    counts = {}
+    for names in results:
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+    return counts
 
 
 def get_names(contents):
     u'''
-    Work-horse function to extract all the names defined in the current bib file.
+    Extracts all the names defined in the contents of a bib file.
+    '''
+    return sorted(set(_get_name_list(contents)))
+
+
+def _get_name_list(contents):
+    u'''
+    Work-horse function to extract all occurrences of names in the contents
+    of a bib file.
     '''
     names = []
 
@@ -118,7 +159,8 @@ def get_names(contents):
                 chars.append(c)
 
             names.extend([
-                unicode(Name(s)) for s in tokenize_list(u''.join(chars))
+                unicode(parse_name(s))
+                for s in tokenize_list(u''.join(chars))
             ])
 
             pos += len(chars)
@@ -126,11 +168,140 @@ def get_names(contents):
                 break
             in_entry = False
 
-    return sorted(set(names))
+    return tuple(names)
+
+
+# normalized bib file -> (cache name of its cached entries, name counts)
+_CACHED_NAMES = {}
+# the maximum number of bib files whose names are kept in _CACHED_NAMES
+_MAX_CACHED_NAMES = 32
+
+
+def get_names_from_bib_cache(bib_file):
+    u'''
+    Returns a dict mapping each name in the bib file to the number of times
+    it occurs, using the entries stored in the bib cache by either
+    bibliography plugin. If the bib file is not cached, it is not parsed
+    and an empty dict is returned.
+    '''
+    for plugin in ('new', 'trad'):
+        bib_cache = BibCache(plugin, bib_file)
+        try:
+            bib_entries = bib_cache.get_bib_entries()
+        except CacheMiss:
+            continue
+
+        # the cache names are derived from the content of the bib file, so
+        # the counts are only reused while the bib file is unchanged
+        cache_name = bib_cache.cache_name
+        key = os.path.normcase(os.path.normpath(bib_file))
+        cached = _CACHED_NAMES.get(key)
+        if cached is not None and cached[0] == cache_name:
+            return cached[1]
+
+        if hasattr(bib_entries, 'rows'):
+            bib_entries = bib_entries.rows()
+
+        counts = {}
+        for entry in bib_entries:
+            if hasattr(entry, 'table_row'):
+                entry = entry.table_row()
+            for field in NAME_FIELDS:
+                value = entry.get(field)
+                if not value:
+                    continue
+                # the same names occur in many entries, so the memoized
+                # tokenization and parsing are used
+                for s in tokenize_list(value):
+                    if s.strip():
+                        name = unicode(parse_name(s))
+                        counts[name] = counts.get(name, 0) + 1
+
+        # the counts of an earlier version of the bib file are replaced;
+        # other bib files are only evicted when too many are kept
+        if (
+            key not in _CACHED_NAMES and
+            len(_CACHED_NAMES) >= _MAX_CACHED_NAMES
+        ):
+            del _CACHED_NAMES[next(iter(_CACHED_NAMES))]
+        _CACHED_NAMES[key] = (cache_name, counts)
+        return counts
+
+    return {}
+
+
+def get_project_bib_files(view):
+    u'''
+    Returns the other bib files used by the documents open in the same
+    window which use the bib file of the view.
+    '''
+    bib_file = view.file_name()
+    window = view.window()
+    if not bib_file or window is None:
+        return []
+
+    bib_file = os.path.normcase(os.path.normpath(bib_file))
+
+    tex_roots = set()
+    for other_view in window.views():
+        if other_view.score_selector(0, 'text.tex.latex') > 0:
+            tex_root = get_tex_root(other_view)
+            if tex_root is not None:
+                tex_roots.add(tex_root)
+
+    result = set()
+    for tex_root in tex_roots:
+        try:
+            bib_files = find_bib_files(tex_root)
+        except:
+            continue
+
+        normalized = [
+            os.path.normcase(os.path.normpath(f)) for f in bib_files
+        ]
+        if bib_file in normalized:
+            result.update(
+                f for f, n in zip(bib_files, normalized) if n != bib_file
+            )
+
+    return sorted(result)
+
+
+def get_name_counts(view):
+    u'''
+    Returns the name counts of the bib buffer, including those of the other
+    bib files of the project if the `bibliography_name_completions_project`
+    setting is enabled.
+    '''
+    counts = get_names_from_view(view)
+    if not get_setting(
+        'bibliography_name_completions_project', False, view=view
+    ):
+        return counts
+
+    counts = dict(counts)
+    for bib_file in get_project_bib_files(view):
+        for name, count in get_names_from_bib_cache(bib_file).items():
+            counts[name] = counts.get(name, 0) + count
+    return counts
+
+
+def rank_names(counts):
+    u'''
+    Returns the names ordered by the number of times they occur, most
+    frequent first, and alphabetically otherwise.
+    '''
+    return sorted(counts, key=lambda name: (-counts[name], name))
 
 
 class BiblatexNameCompletions(sublime_plugin.EventListener):
 
+    def on_close(self, view):
+        drop_buffer_indexes(view)
+
+    def on_modified(self, view):
+        note_modification(view)
+
     def on_query_completions(self, view, prefix, locations):
         if not is_bib_buffer(view):
             return []
@@ -144,7 +315,7 @@ class BiblatexNameCompletions(sublime_plugin.EventListener):
         if matcher:
             return ([
                 (name, _get_replacement(matcher, name))
-                for name in get_names_from_view(view)
+                for name in rank_names(get_name_counts(view))
             ],
                 sublime.INHIBIT_WORD_COMPLETIONS |
                 sublime.INHIBIT_EXPLICIT_COMPLETIONS)
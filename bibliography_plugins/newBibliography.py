@@ -2,26 +2,35 @@ from latextools_plugin import LaTeXToolsPlugin
 
 try:
     from LaTeXTools.external.bibtex import Parser
-    from LaTeXTools.external.bibtex.names import Name
+    from LaTeXTools.external.bibtex.names import (
+        Name, normalize_names, parse_name
+    )
     from LaTeXTools.external.bibtex.tex import tokenize_list
+    from LaTeXTools.external.bibtex.utils import Memo
 
     from LaTeXTools.external import latex_chars
 except ImportError:
     from external.bibtex import Parser
-    from external.bibtex.names import Name
+    from external.bibtex.names import Name, normalize_names, parse_name
     from external.bibtex.tex import tokenize_list
+    from external.bibtex.utils import Memo
 
     from external import latex_chars
 from latextools_utils import bibcache
+from latextools_utils.bibindex import EntryList
 
 import codecs
 from collections import Mapping
+from multiprocessing.pool import ThreadPool
 import sublime
 import traceback
 
 # LaTeX -> Unicode decoder
 latex_chars.register()
 
+# the maximum number of bib files loaded at the same time
+_MAX_LOADERS = 4
+
 if sublime.version() < '3000':
     def _get_people_long(people):
         return u' and '.join([unicode(x) for x in people])
@@ -60,12 +69,26 @@ def remove_latex_commands(s):
 
     return ''.join(chars)
 
+
+def _decode_latex(s):
+    return remove_latex_commands(codecs.decode(s, 'latex'))
+
+# the decoded value by raw field value
+decode_latex = Memo(_decode_latex, 20000)
+
 # wrapper to implement a dict-like interface for bibliographic entries
 # returning formatted value, if it is available
 class EntryWrapper(Mapping):
     def __init__(self, entry):
         self.entry = entry
 
+    def table_row(self):
+        # the raw fields stored in the bib cache; when loaded, the wrapper
+        # is created around a view of these fields
+        row = dict(self.entry.resolved)
+        row['keyword'] = self.entry.cite_key
+        return row
+
     def __getitem__(self, key):
         if not key:
             return u''
@@ -81,14 +104,20 @@ class EntryWrapper(Mapping):
         if key == 'keyword' or key == 'citekey':
             return self.entry.cite_key
 
+        # the resolved fields include those inherited via crossref and
+        # xdata; a missing field is only reported once, here
+        value = self.entry.get(key)
+        if value is None:
+            raise KeyError(key)
+
         if key in Name.NAME_FIELDS:
             people = []
-            for x in tokenize_list(self.entry[key]):
+            for x in tokenize_list(value):
                 if x.strip() == '':
                     continue
 
                 try:
-                    people.append(Name(x))
+                    people.append(parse_name(x))
                 except:
                     print(u'Error handling field "{0}" with value "{1}"'.format(
                         key, x
@@ -104,9 +133,9 @@ class EntryWrapper(Mapping):
                 result = _get_people_long(people)
 
         if not result:
-            result = self.entry[key]
+            result = value
 
-        return remove_latex_commands(codecs.decode(result, 'latex'))
+        return decode_latex(result)
 
     def __iter__(self):
         return iter(self.entry)
@@ -118,59 +147,93 @@ class EntryWrapper(Mapping):
 class NewBibliographyPlugin(LaTeXToolsPlugin):
 
     def get_entries(self, *bib_files):
-        entries = []
-        parser = Parser()
-
-        for bibfname in bib_files:
-            bib_cache = bibcache.BibCache("new", bibfname)
+        # the cached entries are looked up first; the bib files which are not
+        # cached are parsed concurrently; the entries are returned in the
+        # order of the bib files
+        results = [self._get_cached_entries(f) for f in bib_files]
+        uncached = [i for i, result in enumerate(results) if result is None]
+
+        if len(uncached) > 1:
+            # a refresh of the bibliography applies to the worker threads
+            refreshing = bibcache.is_refreshing()
+
+            def _load(bibfname):
+                if refreshing:
+                    with bibcache.refreshing():
+                        return self._load_bib_file(bibfname)
+                return self._load_bib_file(bibfname)
+
+            pool = ThreadPool(min(len(uncached), _MAX_LOADERS))
             try:
-                cached_entries = bib_cache.get()
-                entries.extend(cached_entries)
-                continue
-            except:
-                pass
-
-            try:
-                bibf = codecs.open(bibfname, 'r', 'UTF-8', 'ignore')  # 'ignore' to be safe
-            except IOError:
-                print("Cannot open bibliography file %s !" % (bibfname,))
-                sublime.status_message("Cannot open bibliography file %s !" % (bibfname,))
-                continue
-            else:
-                bib_data = parser.parse(bibf.read())
+                loaded = pool.map(_load, [bib_files[i] for i in uncached])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            loaded = [self._load_bib_file(bib_files[i]) for i in uncached]
 
-                print ('Loaded %d bibitems' % (len(bib_data)))
+        for i, result in zip(uncached, loaded):
+            results[i] = result
 
-                bib_entries = []
-                for key in bib_data:
-                    entry = bib_data[key]
-                    if entry.entry_type in ('xdata', 'comment', 'string'):
-                        continue
+        entries = EntryList()
+        for bib_entries, index in results:
+            entries.extend(bib_entries, index)
 
-                    # purge some unnecessary fields from the bib entry to save
-                    # some space and time reloading
-                    for k in [
-                        'abstract', 'annotation', 'annote', 'execute',
-                        'langidopts', 'options'
-                    ]:
-                        if k in entry:
-                            del entry[k]
+        print("Found %d total bib entries" % (len(entries),))
+        return entries
 
-                    bib_entries.append(EntryWrapper(entry))
+    def _get_cached_entries(self, bibfname):
+        # returns the cached entries of a single bib file and their index or
+        # None if they are not cached
+        bib_cache = bibcache.BibCache("new", bibfname)
+        try:
+            return bib_cache.get(), bib_cache.get_index()
+        except:
+            return None
+
+    def _load_bib_file(self, bibfname):
+        # parses a single bib file and returns its entries and their index,
+        # which is None if the entries cannot be cached
+        bib_cache = bibcache.BibCache("new", bibfname)
+
+        try:
+            bibf = codecs.open(bibfname, 'r', 'UTF-8', 'ignore')  # 'ignore' to be safe
+        except IOError:
+            print("Cannot open bibliography file %s !" % (bibfname,))
+            sublime.status_message("Cannot open bibliography file %s !" % (bibfname,))
+            return [], None
+
+        try:
+            bib_data = Parser().parse(bibf.read())
+        finally:
+            bibf.close()
+
+        print ('Loaded %d bibitems' % (len(bib_data)))
+
+        bib_entries = []
+        for key in bib_data:
+            entry = bib_data[key]
+            if entry.entry_type in ('xdata', 'comment', 'string'):
+                continue
 
+            # purge some unnecessary fields from the bib entry to save
+            # some space and time reloading
+            # only fields of the entry itself can be removed
+            for k in [
+                'abstract', 'annotation', 'annote', 'execute',
+                'langidopts', 'options'
+            ]:
                 try:
-                    bib_cache.set(bib_entries)
-                    fmt_entries = bib_cache.get()
-                    entries.extend(fmt_entries)
-                except:
-                    traceback.print_exc()
-                    print("Using bibliography without caching it")
-                    entries.extend(bib_entries)
-            finally:
-                try:
-                    bibf.close()
-                except:
+                    del entry[k]
+                except KeyError:
                     pass
 
-            print("Found %d total bib entries" % (len(entries),))
-        return entries
+            bib_entries.append(EntryWrapper(entry))
+
+        try:
+            bib_cache.set(bib_entries)
+            return bib_cache.get(), bib_cache.get_index()
+        except:
+            traceback.print_exc()
+            print("Using bibliography without caching it")
+            return bib_entries, None
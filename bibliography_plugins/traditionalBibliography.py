@@ -2,38 +2,47 @@ from latextools_plugin import LaTeXToolsPlugin
 
 from external import latex_chars
 from latextools_utils import bibcache
+from latextools_utils.bibindex import EntryList
 
 import codecs
 import re
 import sublime
 import traceback
 
-kp = re.compile(r'@[^\{]+\{\s*(.+)\s*,', re.UNICODE)
-# new and improved regex
-# we must have "title" then "=", possibly with spaces
-# then either {, maybe repeated twice, or "
-# then spaces and finally the title
-# # We capture till the end of the line as maybe entry is broken over several lines
-# # and in the end we MAY but need not have }'s and "s
-# tp = re.compile(r'\btitle\s*=\s*(?:\{+|")\s*(.+)', re.IGNORECASE)  # note no comma!
-# # Tentatively do the same for author
-# # Note: match ending } or " (surely safe for author names!)
-# ap = re.compile(r'\bauthor\s*=\s*(?:\{|")\s*(.+)(?:\}|"),?', re.IGNORECASE)
-# # Editors
-# ep = re.compile(r'\beditor\s*=\s*(?:\{|")\s*(.+)(?:\}|"),?', re.IGNORECASE)
-# # kp2 = re.compile(r'([^\t]+)\t*')
-# # and year...
-# # Note: year can be provided without quotes or braces (yes, I know...)
-# yp = re.compile(r'\byear\s*=\s*(?:\{+|"|\b)\s*(\d+)[\}"]?,?', re.IGNORECASE)
-
-# This may speed things up
-# So far this captures: the tag, and the THREE possible groups
-multip = re.compile(
-    r'\b(author|title|year|editor|journal|eprint)\s*=\s*'
-    r'(?:\{|"|\b)(.+?)(?:\}+|"|\b)\s*,?\s*\Z',
-    re.IGNORECASE | re.UNICODE
+# The whole file is scanned with a single regex, which matches either the
+# start of an entry, capturing its type and key, or a field, capturing its
+# name and its value including any continuation lines. Since the values of
+# all fields are matched, text inside the values, e.g. of an abstract, is
+# never mistaken for a field. Values may contain up to four levels of
+# nested braces; for values nested more deeply, only the opening brace or
+# quote is matched and the value is found by counting braces.
+_NESTED = r'[^{}]*'
+for _ in range(3):
+    _NESTED = r'[^{}]*(?:\{' + _NESTED + r'\}[^{}]*)*'
+
+scanner = re.compile(
+    r'^[ \t]*@[ \t]*(\w+)[ \t]*[{(][ \t]*([^,\s})]*)|'
+    r'([\w-]+)\s*=\s*(?:'
+    r'\{(' + _NESTED + r')\}|'
+    r'"([^"{}]*(?:\{' + _NESTED + r'\}[^"{}]*)*)"|'
+    r'([\w.:/-]+)|'
+    r'([{"]))',
+    re.MULTILINE | re.UNICODE
 )
 
+# lines which are commented out
+_comment_line = re.compile(r'^[ \t]*%.*$', re.MULTILINE)
+
+_delimiters = re.compile(r'[{}"]')
+
+# the fields we extract
+FIELDS = set(['author', 'title', 'year', 'editor', 'journal', 'eprint'])
+
+# the entry types which are not bibliography entries
+IGNORED_TYPES = set(['comment', 'preamble', 'string'])
+
+_whitespace = re.compile(r'\s+', re.UNICODE)
+
 # LaTeX -> Unicode decoder
 latex_chars.register()
 
@@ -41,12 +50,12 @@ latex_chars.register()
 class TraditionalBibliographyPlugin(LaTeXToolsPlugin):
 
     def get_entries(self, *bib_files):
-        entries = []
+        entries = EntryList()
         for bibfname in bib_files:
             bib_cache = bibcache.BibCache("trad", bibfname)
             try:
                 cached_entries = bib_cache.get()
-                entries.extend(cached_entries)
+                entries.extend(cached_entries, bib_cache.get_index())
                 continue
             except:
                 pass
@@ -58,61 +67,14 @@ class TraditionalBibliographyPlugin(LaTeXToolsPlugin):
                 sublime.status_message("Cannot open bibliography file %s !" % (bibfname,))
                 continue
             else:
-                bib_data = bibf.readlines()
-                bib_entries = []
-
-                entry = {}
-                for line in bib_data:
-                    line = line.strip()
-                    # Let's get rid of irrelevant lines first
-                    if line == "" or line[0] == '%':
-                        continue
-                    if line.lower()[0:8] == "@comment":
-                        continue
-                    if line.lower()[0:7] == "@string":
-                        continue
-                    if line.lower()[0:9] == "@preamble":
-                        continue
-                    if line[0] == "@":
-                        if 'keyword' in entry:
-                            bib_entries.append(entry)
-                            entry = {}
-
-                        kp_match = kp.search(line)
-                        if kp_match:
-                            entry['keyword'] = kp_match.group(1)
-                        else:
-                            print(u"Cannot process this @ line: " + line)
-                            print(
-                                u"Previous keyword (if any): " +
-                                entry.get('keyword', '')
-                            )
-                        continue
-
-                    # Now test for title, author, etc.
-                    # Note: we capture only the first line, but that's OK for our purposes
-                    multip_match = multip.search(line)
-                    if multip_match:
-                        key = multip_match.group(1).lower()
-                        value = codecs.decode(multip_match.group(2), 'latex')
-
-                        if key == 'title':
-                            value = value.replace(
-                                '{\\textquoteright}', ''
-                            ).replace('{', '').replace('}', '')
-                        entry[key] = value
-                    continue
-
-                # at the end, we have a single record
-                if 'keyword' in entry:
-                    bib_entries.append(entry)
+                bib_entries = scan_entries(bibf.read())
 
                 print ('Loaded %d bibitems' % (len(bib_entries)))
 
                 try:
                     bib_cache.set(bib_entries)
                     fmt_entries = bib_cache.get()
-                    entries.extend(fmt_entries)
+                    entries.extend(fmt_entries, bib_cache.get_index())
                 except:
                     traceback.print_exc()
                     print("Using bibliography without caching it")
@@ -125,3 +87,125 @@ class TraditionalBibliographyPlugin(LaTeXToolsPlugin):
 
             print("Found %d total bib entries" % (len(entries),))
         return entries
+
+
+def scan_entries(text):
+    '''
+    scans the contents of a bib file and returns a list of its entries as
+    dicts of the key and the fields in FIELDS
+    '''
+    bib_entries = []
+    entry = None
+    # the cleaned values by field and raw value; journals, years and often
+    # authors repeat
+    cleaned = {}
+    text = _comment_line.sub('', text)
+    pos = 0
+    while True:
+        match = scanner.search(text, pos)
+        if match is None:
+            break
+        pos = match.end()
+
+        entry_type, key, field, braced, quoted, bare, opening = \
+            match.groups()
+        if opening is not None:
+            value, end = _scan_value(text, match.start(7))
+            if value is None:
+                continue
+            pos = end
+            if opening == '{':
+                braced = value
+            else:
+                quoted = value
+
+        if entry_type is not None:
+            if entry is not None:
+                bib_entries.append(entry)
+
+            entry = None
+            if entry_type.lower() in IGNORED_TYPES:
+                continue
+
+            if key:
+                entry = {'keyword': key}
+            else:
+                print(u"Cannot process this @ line: " + match.group(0))
+            continue
+
+        if entry is None:
+            continue
+
+        field = field.lower()
+        if field not in FIELDS:
+            continue
+
+        if braced is not None:
+            value = braced
+        elif quoted is not None:
+            value = quoted
+        else:
+            value = bare
+
+        try:
+            entry[field] = cleaned[field, value]
+        except KeyError:
+            entry[field] = cleaned[field, value] = _clean_value(field, value)
+
+    # at the end, we have a single record
+    if entry is not None:
+        bib_entries.append(entry)
+
+    return bib_entries
+
+
+def _clean_value(field, value):
+    # join continuation lines
+    if '\n' in value:
+        value = _whitespace.sub(' ', value)
+    value = value.strip()
+
+    # remove braces around the whole value, e.g. {{Title}} or {{NASA}}
+    while value[:1] == '{' and value[-1:] == '}' and \
+            _closing_brace(value) == len(value) - 1:
+        value = value[1:-1].strip()
+
+    value = latex_chars.decode(value)
+    if field == 'title':
+        value = value.replace(
+            '{\\textquoteright}', ''
+        ).replace('{', '').replace('}', '')
+    return value
+
+
+def _closing_brace(value):
+    # the position of the brace closing the brace at the start of value
+    depth = 0
+    for i, c in enumerate(value):
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def _scan_value(text, start):
+    # the value of a field delimited by the brace or quote at start, and the
+    # position after it; the value is None if it is not terminated
+    delimiter = text[start]
+    depth = 0
+    for match in _delimiters.finditer(text, start + 1):
+        c = match.group()
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            if depth == 0:
+                if delimiter == '{':
+                    return text[start + 1:match.start()], match.end()
+                break
+            depth -= 1
+        elif depth == 0 and delimiter == '"':
+            return text[start + 1:match.start()], match.end()
+    return None, start + 1
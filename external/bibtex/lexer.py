@@ -43,6 +43,11 @@ class Lexer(object):
         self.in_entry = False
 
     def tokenize(self, code):
+        # tokenize on a new instance, so that the same lexer can be used by
+        # several threads at the same time
+        return self.__class__()._tokenize(code)
+
+    def _tokenize(self, code):
         self.code = code
         code_len = self.code_len = len(code)
 
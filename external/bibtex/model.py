@@ -1,20 +1,7 @@
 from .utils import CaseInsensitiveOrderedDict
-from collections import MutableMapping
-import sys
+from collections import Mapping, MutableMapping
 
-__all__ = ['Database', 'Entry']
-
-if sys.version_info > (3, 0):
-    def reraise(tp, value, tb=None):
-        if value is None:
-            value = tp()
-        if value.__traceback__ is not tb:
-            raise value.with_traceback(tb)
-        raise value
-else:
-    exec("""def reraise(tp, value, tb=None):
-    raise tp, value, tb
-""")
+__all__ = ['Database', 'Entry', 'ResolvedFields']
 
 
 class Database(MutableMapping):
@@ -38,6 +25,10 @@ class Database(MutableMapping):
 
         self._entries = CaseInsensitiveOrderedDict()
 
+        # incremented whenever an entry is added, removed or changed, so
+        # that the resolved fields of the entries can be recomputed
+        self._generation = 0
+
     def add_preamble(self, preamble):
         self._preamble.append(preamble)
 
@@ -54,6 +45,7 @@ class Database(MutableMapping):
 
         self._entries[entry.cite_key] = entry
         entry.database = self
+        self._generation += 1
 
     def get_preamble(self):
         return ''.join(self._preamble)
@@ -78,6 +70,7 @@ class Database(MutableMapping):
 
     def __delitem__(self, key):
         del self._entries[key]
+        self._generation += 1
 
     def __iter__(self):
         return iter(self._entries)
@@ -87,12 +80,22 @@ class Database(MutableMapping):
 
 
 class Entry(MutableMapping):
+    '''
+    an entry of a bibtex database
+
+    fields which are not set on the entry are inherited from the entry
+    referenced by its crossref field and the entries listed in its xdata
+    field; the fields of the entry itself take precedence over those from
+    xdata entries, which take precedence over those from the crossref
+    '''
 
     def __init__(self, entry_type, cite_key, *args, **kwargs):
         self.entry_type = entry_type.lower()
         self.cite_key = cite_key
         self.database = None
         self._attributes = CaseInsensitiveOrderedDict(*args, **kwargs)
+        self._resolved = None
+        self._resolved_generation = None
 
     def get_crossref(self):
         if self.database is None:
@@ -103,28 +106,97 @@ class Entry(MutableMapping):
         except KeyError:
             return None
 
+    @property
+    def resolved(self):
+        '''
+        a read-only mapping of all fields of the entry, including the
+        inherited ones
+
+        the mapping is computed when first accessed and only recomputed if
+        the entry or its database changed
+        '''
+        generation = None
+        if self.database is not None:
+            generation = self.database._generation
+
+        resolved = self._resolved
+        if resolved is None or self._resolved_generation != generation:
+            resolved = self._resolved = ResolvedFields(
+                self._resolve(frozenset()))
+            self._resolved_generation = generation
+        return resolved
+
+    def _resolve(self, seen):
+        # returns a dict of all fields by lower case field name; seen
+        # contains the keys of the entries currently being resolved, to
+        # break cyclic references
+        seen = seen.union((self.cite_key.lower(),))
+        attributes = self._attributes
+        fields = {}
+
+        crossref = self._get_entry(attributes.get('crossref'), seen)
+        if crossref is not None:
+            fields.update(crossref._resolve(seen))
+            fields.pop('crossref', None)
+
+        xdata = attributes.get('xdata')
+        if xdata:
+            # earlier xdata entries take precedence over later ones
+            for key in reversed(xdata.split(',')):
+                entry = self._get_entry(key, seen)
+                if entry is not None:
+                    inherited = entry._resolve(seen)
+                    inherited.pop('xdata', None)
+                    fields.update(inherited)
+
+        fields.update(attributes)
+        return fields
+
+    def _get_entry(self, key, seen):
+        if self.database is None or not key:
+            return None
+
+        key = key.strip().lower()
+        if key in seen:
+            return None
+
+        try:
+            return self.database[key]
+        except KeyError:
+            return None
+
+    def _changed(self):
+        self._resolved = None
+        if self.database is not None:
+            self.database._generation += 1
+
+    def __getstate__(self):
+        # the resolved fields are not pickled, but recomputed when needed
+        state = self.__dict__.copy()
+        state['_resolved'] = None
+        return state
+
+    def get(self, key, default=None):
+        if key is None:
+            return default
+        return self.resolved.get(key, default)
+
     def __getitem__(self, key):
         if key is None:
             raise KeyError()
 
-        try:
-            return self._attributes[key]
-        except KeyError:
-            exc_info = sys.exc_info()
+        return self.resolved[key]
 
-            if key.lower() != 'crossref':
-                try:
-                    return self.get_crossref()[key]
-                except TypeError:
-                    reraise(*exc_info)
-            else:
-                reraise(*exc_info)
+    def __contains__(self, key):
+        return key is not None and key in self.resolved
 
     def __setitem__(self, key, value):
         self._attributes[key] = value
+        self._changed()
 
     def __delitem__(self, key):
         del self._attributes[key]
+        self._changed()
 
     def __iter__(self):
         return iter(self._attributes)
@@ -134,3 +206,30 @@ class Entry(MutableMapping):
 
     def __repr__(self):
         return u'<Entry [{0}]>'.format(self.cite_key)
+
+
+class ResolvedFields(Mapping):
+    '''
+    read-only mapping of the resolved fields of an entry; field names are
+    case-insensitive and get() does not raise on a missing field
+    '''
+
+    __slots__ = ['_fields']
+
+    def __init__(self, fields):
+        self._fields = fields
+
+    def get(self, key, default=None):
+        return self._fields.get(key.lower(), default)
+
+    def __getitem__(self, key):
+        return self._fields[key.lower()]
+
+    def __contains__(self, key):
+        return key.lower() in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
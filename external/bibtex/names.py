@@ -1,8 +1,9 @@
-from .tex import split_tex_string
+from .tex import split_tex_string, tokenize_list
+from .utils import Memo
 from collections import namedtuple
 import sys
 
-__all__ = ['Name']
+__all__ = ['Name', 'parse_name', 'normalize_names']
 
 if sys.version_info > (3, 0):
     strbase = str
@@ -183,3 +184,18 @@ class Name(object):
 
     __str__ = __unicode__
     __repr__ = __unicode__
+
+
+# Name objects for the raw name strings; the returned Name objects are shared
+# and must not be modified
+parse_name = Memo(Name, 20000)
+
+
+def _normalize_names(list_str):
+    return u' and '.join(
+        unicode(parse_name(s)) for s in tokenize_list(list_str)
+    )
+
+
+# the normalized value of a name field by its raw value
+normalize_names = Memo(_normalize_names, 20000)
@@ -30,8 +30,7 @@ grammar (roughly):
 from .ast import *
 from .lexer import Lexer
 from .model import *
-from .names import Name
-from .tex import tokenize_list
+from .names import Name, normalize_names
 
 import sys
 
@@ -42,8 +41,16 @@ __all__ = ['Parser']
 
 
 class Parser(object):
+    '''
+    parser for bibtex databases
 
-    def __init__(self, lexer=Lexer()):
+    the state of a parse is only kept on a copy of the parser made for each
+    call to parse(), so a single instance can be used by several threads at
+    the same time; if no lexer is given, a new Lexer is created for each
+    call
+    '''
+
+    def __init__(self, lexer=None):
         super(Parser, self).__init__()
         self.lexer = lexer
         self.tokens = []
@@ -54,7 +61,14 @@ class Parser(object):
         self._mark_locations = []
 
     def parse(self, s):
-        self.tokens = self.lexer.tokenize(s)
+        lexer = self.lexer
+        if lexer is None:
+            lexer = Lexer()
+
+        return self.__class__(lexer)._parse(lexer.tokenize(s))
+
+    def _parse(self, tokens):
+        self.tokens = tokens
         self._current_token = 0
         self._tokens_len = len(self.tokens)
         self._mark_locations = []
@@ -93,9 +107,7 @@ class Parser(object):
                 for field in entry_node.fields:
                     entry[field.key] = self._handle_value(field.value)
                     if field.key in Name.NAME_FIELDS:
-                        entry[field.key] = ' and '.join(
-                            (unicode(Name(s)) for s in
-                                tokenize_list(entry[field.key])))
+                        entry[field.key] = normalize_names(entry[field.key])
 
                 database.add_entry(entry)
             elif token_type == 'EOF':
@@ -364,3 +364,94 @@ class TestEntry(unittest.TestCase):
             self.entry.__getitem__,
             'title'
         )
+
+    def test_entry_getitem_uses_xdata(self):
+        entry1 = Entry('xdata', 'key1')
+        entry1._attributes['publisher'] = 'Harper & Brothers'
+        entry1._attributes['location'] = 'New York'
+
+        entry2 = Entry('xdata', 'key2')
+        entry2._attributes['location'] = 'London'
+
+        self.database.add_entry(entry1)
+        self.database.add_entry(entry2)
+
+        self.entry._attributes['xdata'] = 'key1, key2'
+        self.entry._attributes['title'] = 'Moby Dick'
+
+        self.database.add_entry(self.entry)
+
+        self.assertEqual(
+            self.entry['publisher'],
+            'Harper & Brothers'
+        )
+
+        self.assertEqual(
+            self.entry['location'],
+            'New York'
+        )
+
+    def test_entry_fields_take_precedence_over_xdata_and_crossref(self):
+        entry1 = Entry('book', 'key1')
+        entry1._attributes['title'] = 'Crossref'
+        entry1._attributes['year'] = '1851'
+        entry1._attributes['location'] = 'London'
+
+        entry2 = Entry('xdata', 'key2')
+        entry2._attributes['title'] = 'Xdata'
+        entry2._attributes['location'] = 'New York'
+
+        self.database.add_entry(entry1)
+        self.database.add_entry(entry2)
+
+        self.entry._attributes['crossref'] = 'key1'
+        self.entry._attributes['xdata'] = 'key2'
+        self.entry._attributes['title'] = 'Moby Dick'
+
+        self.database.add_entry(self.entry)
+
+        self.assertEqual(self.entry['title'], 'Moby Dick')
+        self.assertEqual(self.entry['location'], 'New York')
+        self.assertEqual(self.entry['year'], '1851')
+
+    def test_entry_getitem_with_cyclic_crossref(self):
+        entry1 = Entry('book', 'key1')
+        entry1._attributes['crossref'] = 'key'
+        entry1._attributes['title'] = 'Moby Dick'
+
+        self.database.add_entry(entry1)
+
+        self.entry._attributes['crossref'] = 'key1'
+
+        self.database.add_entry(self.entry)
+
+        self.assertEqual(self.entry['title'], 'Moby Dick')
+        self.assertRaises(KeyError, entry1.__getitem__, 'year')
+
+    def test_entry_get_returns_default_for_missing_field(self):
+        self.database.add_entry(self.entry)
+
+        self.assertIsNone(self.entry.get('title'))
+        self.assertEqual(self.entry.get('title', ''), '')
+        self.assertFalse('title' in self.entry)
+
+    def test_resolved_fields_are_updated_on_change(self):
+        entry1 = Entry('book', 'key1')
+        entry1['title'] = 'Moby Dick'
+
+        self.database.add_entry(entry1)
+
+        self.entry['crossref'] = 'key1'
+
+        self.database.add_entry(self.entry)
+
+        self.assertEqual(self.entry['title'], 'Moby Dick')
+
+        entry1['title'] = 'The Whale'
+        self.assertEqual(self.entry['title'], 'The Whale')
+
+        self.entry['title'] = 'Moby-Dick; or, The Whale'
+        self.assertEqual(self.entry['title'], 'Moby-Dick; or, The Whale')
+
+        del self.entry['title']
+        self.assertEqual(self.entry['title'], 'The Whale')
@@ -2,6 +2,7 @@ from ..ast import *
 from ..model import *
 from ..parser import Parser
 
+import threading
 import unittest
 
 
@@ -1027,3 +1028,39 @@ class TestParse(unittest.TestCase):
             parser.parse,
             None
         )
+
+
+class TestConcurrentParse(unittest.TestCase):
+
+    def test_parse_does_not_change_parser(self):
+        parser = Parser()
+        parser.parse(u'@book{key, title = {Title}}')
+
+        self.assertEqual(parser.tokens, [])
+        self.assertIsNone(parser.database)
+
+    def test_parse_from_several_threads(self):
+        parser = Parser()
+        results = {}
+
+        def parse(i):
+            bib = u''.join(
+                u'@book{{key{0}_{1}, title = {{Title {1}}}}}\n'.format(i, j)
+                for j in range(200)
+            )
+            results[i] = parser.parse(bib)
+
+        threads = [
+            threading.Thread(target=parse, args=(i,)) for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i in range(4):
+            self.assertEqual(len(results[i]), 200)
+            self.assertEqual(
+                results[i].get_entries('key{0}_199'.format(i))[0]['title'],
+                'Title 199'
+            )
@@ -0,0 +1,44 @@
+from ..utils import Memo
+
+import unittest
+
+
+class TestMemo(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def func(key):
+            self.calls.append(key)
+            return key.upper()
+
+        self.memo = Memo(func, 2)
+
+    def test_memoizes_result(self):
+        self.assertEqual(self.memo(u'a'), u'A')
+        self.assertEqual(self.memo(u'a'), u'A')
+        self.assertEqual(self.calls, [u'a'])
+
+    def test_counts_hits_and_misses(self):
+        self.memo(u'a')
+        self.memo(u'a')
+        self.memo(u'b')
+        self.assertEqual(self.memo.hits, 1)
+        self.assertEqual(self.memo.misses, 2)
+        self.assertAlmostEqual(self.memo.hit_rate(), 1.0 / 3)
+
+    def test_evicts_least_recently_used(self):
+        self.memo(u'a')
+        self.memo(u'b')
+        self.memo(u'a')
+        self.memo(u'c')
+        self.assertEqual(len(self.memo), 2)
+
+        self.memo(u'a')
+        self.memo(u'b')
+        self.assertEqual(self.calls, [u'a', u'b', u'c', u'b'])
+
+    def test_does_not_memoize_exceptions(self):
+        memo = Memo(int)
+        self.assertRaises(ValueError, memo, u'x')
+        self.assertEqual(len(memo), 0)
+        self.assertEqual(memo.misses, 0)
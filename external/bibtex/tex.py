@@ -1,3 +1,5 @@
+from .utils import Memo
+
 import re
 
 
@@ -51,5 +53,13 @@ def split_tex_string(string, maxsplit=-1, sep=None):
     return [part.strip() for part in result if part]
 
 
+def _tokenize_list(key):
+    list_str, _and = key
+    return tuple(split_tex_string(list_str, sep=r'(?iu)(?:|([\s~])+)' + _and + r'(?:[\s~]+|$)'))
+
+# the same lists of names occur many times in a bibliography
+tokenize_list_memo = Memo(_tokenize_list, 20000)
+
+
 def tokenize_list(list_str, _and='and'):
-    return split_tex_string(list_str, sep=r'(?iu)(?:|([\s~])+)' + _and + r'(?:[\s~]+|$)')
+    return list(tokenize_list_memo((list_str, _and)))
@@ -1,3 +1,5 @@
+import threading
+
 try:
     from collections import OrderedDict
 except (ImportError, NameError):
@@ -302,3 +304,61 @@ class CaseInsensitiveOrderedDict(OrderedDict):
             return super(CaseInsensitiveOrderedDict, self).pop(key)
         else:
             return super(CaseInsensitiveOrderedDict, self).pop(key, default)
+
+
+class Memo(object):
+    '''
+    A bounded memo for a function taking a single hashable argument, e.g. a
+    raw string from a bib file. When the memo is full, the least recently
+    used results are evicted. Hits and misses are counted so the size of
+    the memo can be tuned.
+    '''
+
+    def __init__(self, func, maxsize=10000):
+        self.func = func
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, key):
+        results = self._results
+        with self._lock:
+            try:
+                # move the result to the end of the eviction order
+                result = results.pop(key)
+            except KeyError:
+                pass
+            else:
+                results[key] = result
+                self.hits += 1
+                return result
+
+        result = self.func(key)
+
+        with self._lock:
+            self.misses += 1
+            results[key] = result
+            while len(results) > self.maxsize:
+                results.popitem(last=False)
+
+        return result
+
+    def __len__(self):
+        return len(self._results)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def info(self):
+        return (
+            u'{0} hits, {1} misses ({2:.1%} hit rate), {3}/{4} entries'
+        ).format(
+            self.hits, self.misses, self.hit_rate(), len(self), self.maxsize)
@@ -6,6 +6,8 @@ Usage:
  - codecs.encode(string,'latex')
  - codecs.decode('latex')
 are both available just by letting "import latex_chars" find this file.
+ - latex_chars.decode(string)
+is the same as codecs.decode(string,'latex'), without the codec lookup.
  - unicode(string,'latex+latin1')
  - ustring.decode('latex+latin1')
 where latin1 can be replaced by any other known encoding, also
@@ -28,6 +30,16 @@ def register():
     """
     codecs.register(_registry)
 
+def decode(tex):
+    """Convert latex source string to unicode. Faster than using the codec
+    when decoding many short strings."""
+    try:
+        tex = unicode(tex)
+    except NameError:
+        # Python 3
+        pass
+    return _decode(tex)
+
 def getregentry():
     """Encodings module API."""
     return _registry('latex')
@@ -72,12 +84,13 @@ def _registry(encoding):
             # but we can make them joinable by calling unicode.
             # This should always be safe since we are supposed
             # to be producing unicode output anyway.
+            input_len = len(input)
             try:
-                x = map(unicode, _unlatex(input))
+                input = unicode(input)
             except NameError:
                 # Python 3
-                x = _unlatex(input)
-            return u''.join(x), len(input)
+                pass
+            return _decode(input), input_len
 
     class StreamWriter(Codec, codecs.StreamWriter):
         pass
@@ -139,6 +152,7 @@ class _unlatex(object):
     def __init__(self, tex):
         """Create a new token converter from a string."""
         self.tex = tuple(_tokenize(tex))  # turn tokens into indexable list
+        self.l2u, self.blacklist = _get_tables()
         self.pos = 0                      # index of first unprocessed token 
         self.lastoutput = 'x'             # lastoutput must always be nonempty string
 
@@ -167,6 +181,7 @@ class _unlatex(object):
 
     def chunk(self):
         """Grab another set of input tokens and convert them to an output string."""
+        _l2u = self.l2u
         for delta, c in self.candidates(0):
             if c in _l2u:
                 self.pos += delta
@@ -197,7 +212,7 @@ class _unlatex(object):
         is the length of the tokens prior to bracket deletion.
         """
         t = self[offset]
-        if t in _blacklist:
+        if t in self.blacklist:
             return
         elif t == '{':
             for delta, c in self.candidates(offset+1):
@@ -503,49 +518,177 @@ _ignore = set([chr(i) for i in list(range(32))+[127]]) - set('\t\n\r')
 # Regexp of chars not in blacklist, for quick start of tokenize
 _stoppers = re.compile('[\x00-\x1f!$\\-?\\{~\\\\`\']')
 
-_blacklist = set(' \n\r')
-_blacklist.add(None)    # shortcut candidate generation at end of data
 
-# Construction of inverse translation table
-_l2u = {
-    '\ ': ord(' ')   # unexpanding space makes no sense in non-TeX contexts
-}
+def _build_tables():
+    """Build the inverse translation table and the blacklist."""
+    blacklist = set(' \n\r')
+    blacklist.add(None)    # shortcut candidate generation at end of data
+
+    # Construction of inverse translation table
+    l2u = {
+        '\ ': ord(' ')   # unexpanding space makes no sense in non-TeX contexts
+    }
+
+    for _tex in latex_equivalents:
+        if _tex <= 0x0020 or (_tex <= 0x007f and len(latex_equivalents[_tex]) <= 1):
+            continue    # boring entry
+        _toks = tuple(_tokenize(latex_equivalents[_tex]))
+        if _toks[0] == '{' and _toks[-1] == '}':
+            _toks = _toks[1:-1]
+        if _toks[0].isalpha():
+            continue    # don't turn ligatures into single chars
+        if len(_toks) == 1 and (_toks[0] == "'" or _toks[0] == "`"):
+            continue    # don't turn ascii quotes into curly quotes
+        if _toks[0] == '\\mbox' and _toks[1] == '{' and _toks[-1] == '}':
+            _toks = _toks[2:-1]
+        if len(_toks) == 4 and _toks[1] == '{' and _toks[3] == '}':
+            _toks = (_toks[0], _toks[2])
+        if len(_toks) == 1:
+            _toks = _toks[0]
+        l2u[_toks] = _tex
+
+    # Shortcut candidate generation for certain useless candidates:
+    # a character is in blacklist if it can not be at the start
+    # of any translation in l2u.  We use this to quickly skip through
+    # such characters before getting to more difficult-translate parts.
+    for i in range(0x0020, 0x007f):
+        blacklist.add(chr(i))
+    blacklist.remove('{')
+    blacklist.remove('$')
+    for candidate in l2u:
+        if isinstance(candidate, tuple):
+            if not candidate or not candidate[0]:
+                continue
+            firstchar = candidate[0][0]
+        else:
+            firstchar = candidate[0]
+        blacklist.discard(firstchar)
 
-for _tex in latex_equivalents:
-    if _tex <= 0x0020 or (_tex <= 0x007f and len(latex_equivalents[_tex]) <= 1):
-        continue    # boring entry
-    _toks = tuple(_tokenize(latex_equivalents[_tex]))
-    if _toks[0] == '{' and _toks[-1] == '}':
-        _toks = _toks[1:-1]
-    if _toks[0].isalpha():
-        continue    # don't turn ligatures into single chars
-    if len(_toks) == 1 and (_toks[0] == "'" or _toks[0] == "`"):
-        continue    # don't turn ascii quotes into curly quotes
-    if _toks[0] == '\\mbox' and _toks[1] == '{' and _toks[-1] == '}':
-        _toks = _toks[2:-1]
-    if len(_toks) == 4 and _toks[1] == '{' and _toks[3] == '}':
-        _toks = (_toks[0], _toks[2])
-    if len(_toks) == 1:
-        _toks = _toks[0]
-    _l2u[_toks] = _tex
-
-# Shortcut candidate generation for certain useless candidates:
-# a character is in _blacklist if it can not be at the start
-# of any translation in _l2u.  We use this to quickly skip through
-# such characters before getting to more difficult-translate parts.
-# _blacklist is defined several lines up from here because it must
-# be defined in order to call _tokenize, however it is safe to
-# delay filling it out until now.
-
-for i in range(0x0020, 0x007f):
-    _blacklist.add(chr(i))
-_blacklist.remove('{')
-_blacklist.remove('$')
-for candidate in _l2u:
-    if isinstance(candidate, tuple):
-        if not candidate or not candidate[0]:
-            continue
-        firstchar = candidate[0][0]
-    else:
-        firstchar = candidate[0]
-    _blacklist.discard(firstchar)
+    return l2u, blacklist
+
+# The translation tables are built when the first string is decoded,
+# rather than at import time, and cached
+_tables = None
+
+
+def _get_tables():
+    """Return the inverse translation table and the blacklist."""
+    global _tables
+    if _tables is None:
+        _tables = _build_tables()
+    return _tables
+
+
+class _FastDecoder(object):
+    """Table-driven decoder for the common cases.
+
+    Strings without any character which may start a translation are
+    returned unchanged. Otherwise accented letters, single control
+    sequences, dashes, quotes and ties, optionally wrapped in braces, are
+    replaced in a single regex pass. If anything that might still need
+    translating remains, decode() returns None and the full decoder must
+    be used, so the result is always the same as that of _unlatex.
+    """
+
+    def __init__(self):
+        l2u, blacklist = _get_tables()
+
+        # chars which may start a translation; lone braces are left as-is
+        # by the full decoder
+        specials = set(chr(i) for i in range(0x0020, 0x007f)) - blacklist
+        specials.discard('{')
+        specials |= _ignore
+        self._special = re.compile(
+            '[' + ''.join(re.escape(c) for c in sorted(specials)) + ']')
+
+        self._table = table = {}
+        accents = set()
+        for key in l2u:
+            if isinstance(key, tuple):
+                if len(key) != 2:
+                    continue
+                if key[0].startswith('\\'):
+                    accents.add(key[0])
+            table[key] = _unichr(l2u[key])
+        # correct failure to undot i
+        for key in list(table):
+            if isinstance(key, tuple) and key[1] == '\\i':
+                table.setdefault((key[0], 'i'), table[key])
+
+        # letters as in str.isalpha(), which is used by the tokenizer
+        alpha = r'[^\W\d_]'
+        accent_re = '|'.join(
+            re.escape(a) + ('(?!' + alpha + ')' if a[-1].isalpha() else '')
+            for a in sorted(accents, key=len, reverse=True))
+
+        self._sub = re.compile(
+            # the full decoder also drops braces around a translation
+            r'(?<![{\\])(\{)?(?:'
+            # accent and argument, e.g. \'e, \'{e}, \v s, \'\i
+            r'(?P<accent>' + accent_re + r')\s*(?:'
+            r'\{(?P<barg>' + alpha + r'|\\' + alpha + r'+\s*)\}|'
+            r'(?P<arg>' + alpha + r')|'
+            r'(?P<csarg>\\' + alpha + r'+)(?!' + alpha + r')\s*)|'
+            # single control sequences, e.g. \ss, \&
+            r'(?P<cs>\\(?:' + alpha + r'+(?!' + alpha + r')|[^\w]))\s*|'
+            # dashes, quotes, ties and inverted marks; these must not start
+            # within a run of the same tokens
+            r'(?P<other>(?<!-)-+|(?<![`!?])``|(?<!\')\'\'|[!?]`|~)'
+            r')(?(1)\})',
+            re.UNICODE
+        )
+
+        # anything the substitution may have left untranslated
+        self._residual = re.compile(
+            r'[\\$~]|--|``|\'\'|[!?]`|[' +
+            ''.join(re.escape(c) for c in sorted(_ignore)) + ']')
+
+    def _replace(self, m):
+        accent = m.group('accent')
+        if accent is not None:
+            arg = m.group('arg') or m.group('csarg') or m.group('barg')
+            key = (accent, arg.rstrip())
+        else:
+            key = m.group('cs') or m.group('other')
+            start = m.start('other')
+            if key == '~' and start > 0 and m.string[start - 1] == '/':
+                return m.group(0)    # protect ~ in urls
+        try:
+            return self._table[key]
+        except KeyError:
+            return m.group(0)
+
+    def decode(self, tex):
+        if not self._special.search(tex):
+            return tex
+
+        result = self._sub.sub(self._replace, tex)
+        if self._residual.search(result):
+            return None
+        return result
+
+_fast_decoder = None
+
+
+def _get_fast_decoder():
+    global _fast_decoder
+    if _fast_decoder is None:
+        _fast_decoder = _FastDecoder()
+    return _fast_decoder
+
+
+def _unichr(i):
+    try:
+        return unichr(i)
+    except NameError:
+        # Python 3
+        return chr(i)
+
+
+def _decode(tex):
+    """Convert latex source string to unicode, using the table-driven fast
+    path where possible."""
+    result = _get_fast_decoder().decode(tex)
+    if result is None:
+        result = u''.join(_unlatex(tex))
+    return result
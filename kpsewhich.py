@@ -1,46 +1,312 @@
 from __future__ import print_function
 
 import sublime
+import sublime_plugin
+
+import hashlib
+import os
+from subprocess import PIPE
+import threading
+import time
 import traceback
 
 if sublime.version() < '3000':
     _ST3 = False
+    from latextools_utils import cache
     from latextools_utils.external_command import (
-        check_output, CalledProcessError
+        check_output, get_texpath, CalledProcessError
     )
 else:
     _ST3 = True
+    from .latextools_utils import cache
     from .latextools_utils.external_command import (
-        check_output, CalledProcessError
+        check_output, get_texpath, CalledProcessError
     )
 
-__all__ = ['kpsewhich']
+__all__ = ['kpsewhich', 'kpsewhich_many', 'refresh_kpsewhich_cache']
+
+# the environment variables which affect where kpsewhich searches for files
+_TEXMF_VARIABLES = (
+    'TEXMF', 'TEXMFCNF', 'TEXMFDBS', 'TEXMFHOME', 'TEXMFLOCAL', 'TEXMFVAR',
+    'TEXMFCONFIG', 'TEXMFDIST', 'TEXMFMAIN', 'TEXINPUTS', 'BIBINPUTS',
+    'BSTINPUTS', 'MLBIBINPUTS', 'KPATHSEA_DEBUG'
+)
+
+# the maximum number of files looked up by a single kpsewhich process
+_MAX_BATCH_SIZE = 100
+
+# files which could not be found are looked up again after this many seconds
+_MISS_LIFE_SPAN = 60
+
+_lock = threading.Lock()
+# the cache key and the resolved files: format -> {filename: path}
+_resolved_key = None
+_resolved = None
+# (format, filename) -> time of the failed lookup
+_missing = {}
+
+
+def kpsewhich(
+    filename, file_format=None, notify_user_on_error=False, use_cache=True
+):
+    return kpsewhich_many(
+        [filename], file_format, notify_user_on_error, use_cache
+    ).get(filename)
+
+
+def kpsewhich_many(
+    filenames, file_format=None, notify_user_on_error=False, use_cache=True
+):
+    '''
+    returns a dict mapping each of the filenames to the path kpsewhich
+    resolves it to or None if it cannot be found
+
+    the files which have not been resolved before are looked up using as
+    few kpsewhich processes as possible; the results are stored in a
+    global cache, which is specific to the texpath setting and the TEXMF
+    environment variables; use refresh_kpsewhich_cache() to rebuild it
+
+    if use_cache is False, all files are looked up again, e.g. to report
+    the current state of the TeX installation; the cache is updated with
+    the results
+    '''
+    result = {}
+    if not filenames:
+        return result
+
+    resolved = _get_resolved()
+    format_key = file_format or ''
+
+    now = time.time()
+    lookup = []
+    with _lock:
+        paths = resolved.get(format_key, {})
+        for filename in filenames:
+            if filename in result:
+                continue
+
+            if not use_cache:
+                result[filename] = None
+                lookup.append(filename)
+                continue
+
+            path = paths.get(filename)
+            if path is not None and os.path.exists(path):
+                result[filename] = path
+                continue
+
+            missing_since = _missing.get((format_key, filename))
+            if (
+                missing_since is not None and
+                now - missing_since < _MISS_LIFE_SPAN
+            ):
+                result[filename] = None
+                continue
+
+            result[filename] = None
+            lookup.append(filename)
+
+    if not lookup:
+        return result
+
+    found = {}
+    for start in range(0, len(lookup), _MAX_BATCH_SIZE):
+        batch = lookup[start:start + _MAX_BATCH_SIZE]
+        try:
+            found.update(_run_kpsewhich(batch, file_format))
+        except CalledProcessError as e:
+            if notify_user_on_error:
+                sublime.error_message(
+                    'An error occurred while trying to run kpsewhich. '
+                    'Files in your TEXINPUTS could not be accessed.'
+                )
+                if e.output:
+                    print(e.output)
+                traceback.print_exc()
+            return result
+        except OSError:
+            if notify_user_on_error:
+                sublime.error_message(
+                    'Could not run kpsewhich. Please ensure that your texpath '
+                    'setting is correct.'
+                )
+                traceback.print_exc()
+            return result
+
+    with _lock:
+        paths = resolved.setdefault(format_key, {})
+        for filename in lookup:
+            path = found.get(filename)
+            if path is None:
+                _missing[(format_key, filename)] = now
+                paths.pop(filename, None)
+            else:
+                _missing.pop((format_key, filename), None)
+                paths[filename] = path
+            result[filename] = path
+
+    _save_resolved()
+    return result
+
+
+def refresh_kpsewhich_cache():
+    '''
+    drops the cached kpsewhich results and resolves all files which were
+    previously resolved again; returns the number of files resolved
+    '''
+    global _resolved, _resolved_key
+    resolved = _get_resolved()
+    with _lock:
+        previous = dict(
+            (format_key, list(paths.keys()))
+            for format_key, paths in resolved.items()
+        )
+
+    # the configuration may have changed as well
+    key = _get_cache_key()
+    with _lock:
+        _resolved_key = key
+        _resolved = {}
+        _missing.clear()
+
+    count = 0
+    for format_key, filenames in previous.items():
+        result = kpsewhich_many(filenames, format_key or None)
+        count += sum(1 for path in result.values() if path is not None)
+
+    # ensure the (possibly empty) cache is written
+    _save_resolved()
+    return count
 
 
-def kpsewhich(filename, file_format=None, notify_user_on_error=False):
-    # build command
+def _run_kpsewhich(filenames, file_format):
+    # kpsewhich prints the path of each file it finds, in the order in
+    # which they were passed, and nothing for those it cannot find
     command = ['kpsewhich']
     if file_format is not None:
         command.append('-format=%s' % (file_format))
-    command.append(filename)
+    command.extend(filenames)
 
     try:
-        return check_output(command)
+        output = check_output(command, stderr=PIPE)
     except CalledProcessError as e:
-        if notify_user_on_error:
-            sublime.error_message(
-                'An error occurred while trying to run kpsewhich. '
-                'Files in your TEXINPUTS could not be accessed.'
-            )
-            if e.output:
-                print(e.output)
-            traceback.print_exc()
-    except OSError:
-        if notify_user_on_error:
-            sublime.error_message(
-                'Could not run kpsewhich. Please ensure that your texpath '
-                'setting is correct.'
-            )
-            traceback.print_exc()
-
-    return None
+        # the return code is non-zero if any of the files was not found
+        if e.output is None:
+            raise
+        output = e.output
+
+    paths = [line.strip() for line in output.splitlines() if line.strip()]
+    if not paths:
+        return {}
+
+    # match the paths to the filenames in order
+    found = {}
+    i = 0
+    for filename in filenames:
+        if i >= len(paths):
+            break
+        if _matches(paths[i], filename):
+            found[filename] = paths[i]
+            i += 1
+    return found
+
+
+def _matches(path, filename):
+    # kpsewhich may add the default suffix of the format to the name
+    name = os.path.basename(filename)
+    basename = os.path.basename(path)
+    if sublime.platform() == 'windows':
+        name = name.lower()
+        basename = basename.lower()
+    return basename == name or basename.startswith(name + '.')
+
+
+def _get_cache_key():
+    parts = [get_texpath() or '']
+    for variable in _TEXMF_VARIABLES:
+        parts.append(variable)
+        parts.append(os.environ.get(variable, ''))
+
+    md5 = hashlib.md5()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = part.encode('utf-8')
+        md5.update(part)
+        md5.update(b'\0')
+    return 'kpsewhich_{0}'.format(md5.hexdigest())
+
+
+def _get_resolved():
+    global _resolved, _resolved_key
+    if _resolved is not None:
+        return _resolved
+
+    key = _get_cache_key()
+    resolved = dict(
+        (format_key, paths)
+        for format_key, paths in cache.read_global_dict(key).items()
+        if isinstance(paths, dict)
+    )
+
+    _resolved_key = key
+    _resolved = resolved
+    return resolved
+
+
+def _save_resolved():
+    with _lock:
+        if _resolved is None:
+            return
+        key = _resolved_key
+        resolved = dict(
+            (format_key, dict(paths))
+            for format_key, paths in _resolved.items()
+        )
+
+    try:
+        cache.write_global(key, resolved)
+    except:
+        traceback.print_exc()
+
+
+def _reset():
+    global _resolved, _resolved_key
+    with _lock:
+        _resolved = None
+        _resolved_key = None
+
+
+def plugin_loaded():
+    # the texpath setting may change while the plugin is loaded
+    settings = sublime.load_settings('LaTeXTools.sublime-settings')
+    settings.clear_on_change('kpsewhich_cache')
+    settings.add_on_change('kpsewhich_cache', _reset)
+
+
+if not _ST3:
+    plugin_loaded()
+
+
+class LatexRefreshKpsewhichCacheCommand(sublime_plugin.WindowCommand):
+    '''
+    rebuilds the cache of the files resolved using kpsewhich, e.g. after
+    installing new TeX packages
+    '''
+
+    def run(self):
+        def _refresh():
+            try:
+                count = refresh_kpsewhich_cache()
+            except:
+                traceback.print_exc()
+                message = 'Error while refreshing the kpsewhich cache'
+            else:
+                message = 'Refreshed the kpsewhich cache ({0} files)'.format(
+                    count)
+            sublime.set_timeout(
+                lambda: sublime.status_message(message), 0)
+
+        sublime.status_message('Refreshing the kpsewhich cache...')
+        thread = threading.Thread(target=_refresh)
+        thread.daemon = True
+        thread.start()
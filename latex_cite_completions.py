@@ -22,9 +22,9 @@ if sublime.version() < '3000':
     # we are on ST2 and Python 2.X
     _ST3 = False
     import getTeXRoot
-    from kpsewhich import kpsewhich
+    from kpsewhich import kpsewhich_many
     from latextools_utils import (
-        analysis, bibformat, cache, get_setting
+        analysis, bibformat, bibindex, cache, get_setting
     )
     from latextools_utils.internal_types import FillAllHelper
     from latextools_utils.six import strbase, reraise
@@ -32,10 +32,10 @@ if sublime.version() < '3000':
 else:
     _ST3 = True
     from . import getTeXRoot
-    from .kpsewhich import kpsewhich
+    from .kpsewhich import kpsewhich_many
     from .latex_fill_all import FillAllHelper
     from .latextools_utils import (
-        analysis, bibformat, cache, get_setting
+        analysis, bibformat, bibindex, cache, get_setting
     )
     from .latextools_utils.six import strbase, reraise
     from . import latextools_plugin
@@ -254,15 +254,24 @@ def find_bib_files(root):
 
         # extract absolute filepath for each bib file
         rootdir = os.path.dirname(root)
+        missing = []
         for res in resources:
             # We join with rootdir, the dir of the master file
             candidate_file = os.path.normpath(os.path.join(rootdir, res))
-            # if the file doesn't exist, search the default tex paths
-            if not os.path.exists(candidate_file):
-                candidate_file = kpsewhich(res, 'mlbib')
-
-            if candidate_file is not None and os.path.exists(candidate_file):
+            if os.path.exists(candidate_file):
                 result.append(candidate_file)
+            else:
+                missing.append(res)
+
+        # search the default tex paths for the files which don't exist,
+        # using a single kpsewhich call
+        if missing:
+            for candidate_file in kpsewhich_many(missing, 'mlbib').values():
+                if (
+                    candidate_file is not None and
+                    os.path.exists(candidate_file)
+                ):
+                    result.append(candidate_file)
 
         # remove duplicates
         return list(set(result))
@@ -438,11 +447,7 @@ class CiteFillAllHelper(FillAllHelper):
             return []
 
         if prefix:
-            lower_prefix = prefix.lower()
-            completions = [
-                c for c in completions
-                if _is_prefix(lower_prefix, c)
-            ]
+            completions = _filter_completions(prefix.lower(), completions)
 
         if len(completions) == 0:
             return []
@@ -451,17 +456,21 @@ class CiteFillAllHelper(FillAllHelper):
             'cite_autocomplete_format', '{keyword}: {title}'
         )
 
-        def formatted_entry(entry):
-            try:
-                return entry['<autocomplete_formatted>']
-            except:
-                return bibformat.format_entry(cite_autocomplete_format, entry)
+        formatted, unformatted = _get_formatted(
+            completions, '<autocomplete_formatted>')
+        if unformatted:
+            values = bibformat.format_entries(
+                cite_autocomplete_format,
+                [completions[i] for i in unformatted]
+            )
+            for i, value in zip(unformatted, values):
+                formatted[i] = value
 
         completions = [
             (
-                formatted_entry(c),
+                f,
                 c['keyword']
-            ) for c in completions
+            ) for f, c in zip(formatted, completions)
         ]
 
         if old_style:
@@ -485,11 +494,7 @@ class CiteFillAllHelper(FillAllHelper):
             return
 
         if prefix:
-            lower_prefix = prefix.lower()
-            completions = [
-                c for c in completions
-                if _is_prefix(lower_prefix, c)
-            ]
+            completions = _filter_completions(prefix.lower(), completions)
 
         completions_length = len(completions)
         if completions_length == 0:
@@ -502,22 +507,23 @@ class CiteFillAllHelper(FillAllHelper):
             ["{title} ({keyword})", "{author}"]
         )
 
-        def formatted_entry(entry):
-            try:
-                result = entry["<panel_formatted>"]
-                if isinstance(result, tuple):
-                    result = list(result)
-                return result
-            except:
-                return [
-                    bibformat.format_entry(s, entry)
-                    for s in cite_panel_format
-                ]
+        formatted, unformatted = _get_formatted(
+            completions, "<panel_formatted>")
+        if unformatted:
+            entries = [completions[i] for i in unformatted]
+            columns = [
+                bibformat.format_entries(s, entries)
+                for s in cite_panel_format
+            ]
+            for j, i in enumerate(unformatted):
+                formatted[i] = [column[j] for column in columns]
 
         formatted_completions = []
         result_completions = []
-        for completion in completions:
-            formatted_completions.append(formatted_entry(completion))
+        for result, completion in zip(formatted, completions):
+            if isinstance(result, tuple):
+                result = list(result)
+            formatted_completions.append(result)
             result_completions.append(completion['keyword'])
 
         return formatted_completions, result_completions
@@ -535,6 +541,35 @@ class CiteFillAllHelper(FillAllHelper):
         return get_setting('cite_auto_trigger', True)
 
 
+def _get_formatted(completions, key):
+    '''
+    returns the values the bibliography plugin provides for key for each of
+    the completions, and the positions of the completions without them,
+    which are None in the values and should be formatted in bulk
+    '''
+    formatted = []
+    unformatted = []
+    for i, completion in enumerate(completions):
+        try:
+            formatted.append(completion[key])
+        except:
+            formatted.append(None)
+            unformatted.append(i)
+    return formatted, unformatted
+
+
+def _filter_completions(lower_prefix, completions):
+    if get_setting('cite_ranked_search', False):
+        return bibindex.rank(
+            completions, lower_prefix,
+            get_setting('cite_ranked_search_limit', 100))
+
+    # use the index of the bibliography entries if the plugin provides one
+    if hasattr(completions, 'search'):
+        return completions.search(lower_prefix)
+    return [c for c in completions if _is_prefix(lower_prefix, c)]
+
+
 def _is_prefix(lower_prefix, entry):
     try:
         return lower_prefix in entry["<prefix_match>"]
@@ -3,10 +3,15 @@ from __future__ import unicode_literals, print_function
 
 import sublime
 import sublime_plugin
+from functools import partial
 import glob
+import hashlib
+from multiprocessing.pool import ThreadPool
+from operator import itemgetter
 import os
 import re
 import threading
+import traceback
 
 if sublime.version() < '3000':
     # we are on ST2 and Python 2.X
@@ -23,8 +28,9 @@ if sublime.version() < '3000':
     )
     from getRegion import getRegion
     from getTeXRoot import get_tex_root
-    from latextools_utils import get_setting, analysis, utils
+    from latextools_utils import get_setting, analysis, cache, utils
     from latextools_utils.parser_utils import command_to_snippet
+    from latextools_utils.utils import fuzzy_search_sorted
 else:
     _ST3 = True
     from .latex_cite_completions import (
@@ -39,8 +45,9 @@ else:
     )
     from .getRegion import getRegion
     from .getTeXRoot import get_tex_root
-    from .latextools_utils import get_setting, analysis, utils
+    from .latextools_utils import get_setting, analysis, cache, utils
     from .latextools_utils.parser_utils import command_to_snippet
+    from .latextools_utils.utils import fuzzy_search_sorted
 
 __all__ = ['get_cwl_completions', 'is_cwl_available']
 
@@ -86,6 +93,11 @@ def is_cwl_available(view=None):
     return CWL_COMPLETION_ENABLED
 
 
+# whether only the cwl files used by the current document are loaded
+def is_cwl_lazy_loading():
+    return get_setting('cwl_lazy_loading', True)
+
+
 # returns the cwl completions instances
 def get_cwl_completions():
     plugin_loaded()
@@ -108,54 +120,178 @@ class CwlCompletions(object):
         self._triggered = False
         self._completions = None
         self._environment_completions = None
+        # in lazy mode, the base names of the cwl files being loaded and
+        # the path of each available cwl file by its base name
+        self._loading = set()
+        self._cwl_paths = None
+        self._use_package = False
+        # incremented whenever completions are loaded
+        self._generation = 0
+        # (cwl files, env) -> (generation, CompletionIndex)
+        self._merged = {}
+        # tex root -> (analysis id, packages used by the document)
+        self._document_packages = {}
         self._WLOCK = threading.RLock()
 
-    # get the completions
-    def get_completions(self, env=False):
+    # get the completions; if prefix is specified, only the completions
+    # starting with prefix are returned
+    def get_completions(self, env=False, prefix=''):
         with self._WLOCK:
+            if not self._completed and is_cwl_lazy_loading():
+                return self._get_completions_lazily(env, prefix)
+
             if self._completed:
                 self._triggered = False
 
-                cwl_files = []
-                packages = self.get_packages()
-                if len(packages) == 0:
+                cwl_files = self.get_cwl_files()
+                if len(cwl_files) == 0:
                     return []
 
-                for package in packages:
-                    if package.endswith('.cwl'):
-                        cwl_file = package
-                    else:
-                        cwl_file = '{0}.cwl'.format(package)
-
-                    # some hacks for particular packages that do not match
-                    # the standard pattern
-                    if package == 'polyglossia':
-                        cwl_file = 'babel.cwl'
-                    elif package in KOMA_SCRIPT_CLASSES:
-                        cwl_file = 'class-scrartcl,scrreprt,scrbook.cwl'
-
-                    if cwl_file not in cwl_files:
-                        cwl_files.append(cwl_file)
-
-                completions = []
-                if env:
-                    completion_dict = self._environment_completions
-                else:
-                    completion_dict = self._completions
-
-                for cwl_file in cwl_files:
-                    try:
-                        completions.extend(completion_dict[cwl_file])
-                    except KeyError:
-                        # TODO - should we attempt to load the package?
-                        pass
-                return completions
+                return self._collect_completions(cwl_files, env, prefix)
             else:
                 self._triggered = True
                 if not self._started:
                     self.load_completions()
                 return []
 
+    # in lazy mode, only the cwl files of the current document are loaded;
+    # returns the completions of those already loaded and starts loading
+    # the others
+    def _get_completions_lazily(self, env=False, prefix=''):
+        cwl_files = self.get_cwl_files()
+        if len(cwl_files) == 0:
+            return []
+
+        if self._load_cwl_files(cwl_files):
+            self._triggered = True
+        else:
+            self._triggered = False
+
+        return self._collect_completions(cwl_files, env, prefix)
+
+    # returns the merged completions of the cwl files starting with prefix;
+    # the merged completions are kept for each set of cwl files until more
+    # completions are loaded
+    def _collect_completions(self, cwl_files, env=False, prefix=''):
+        key = (tuple(cwl_files), env)
+        try:
+            generation, index = self._merged[key]
+            if generation == self._generation:
+                return index.search(prefix)
+        except KeyError:
+            pass
+
+        if env:
+            completion_dict = self._environment_completions
+        else:
+            completion_dict = self._completions
+
+        packages = []
+        if completion_dict is not None:
+            for cwl_file in cwl_files:
+                try:
+                    packages.append((
+                        os.path.splitext(cwl_file)[0],
+                        completion_dict[cwl_file]
+                    ))
+                except KeyError:
+                    pass
+
+        # typically, there are only a few documents open at a time
+        if len(self._merged) >= _MAX_MERGED_COMPLETIONS:
+            self._merged.clear()
+
+        index = CompletionIndex(packages)
+        self._merged[key] = (self._generation, index)
+        return index.search(prefix)
+
+    # returns the names of the cwl files for the current document
+    def get_cwl_files(self):
+        cwl_files = []
+        for package in self.get_packages():
+            if package.endswith('.cwl'):
+                cwl_file = package
+            else:
+                cwl_file = '{0}.cwl'.format(package)
+
+            # some hacks for particular packages that do not match
+            # the standard pattern
+            if package == 'polyglossia':
+                cwl_file = 'babel.cwl'
+            elif package in KOMA_SCRIPT_CLASSES:
+                cwl_file = 'class-scrartcl,scrreprt,scrbook.cwl'
+
+            if cwl_file not in cwl_files:
+                cwl_files.append(cwl_file)
+
+        return cwl_files
+
+    # starts loading those of the cwl files which have not been loaded yet
+    # on a background thread; returns True if any cwl file is being loaded
+    def _load_cwl_files(self, cwl_files):
+        with self._WLOCK:
+            if self._cwl_paths is None:
+                self._cwl_paths = {}
+                paths, self._use_package = get_cwl_package_files()
+                for path in paths:
+                    self._cwl_paths[os.path.basename(path)] = path
+
+            if self._completions is None:
+                self._completions = {}
+                self._environment_completions = {}
+
+            missing = [
+                cwl_file for cwl_file in cwl_files
+                if cwl_file in self._cwl_paths and
+                cwl_file not in self._completions and
+                cwl_file not in self._loading
+            ]
+
+            if missing:
+                self._loading.update(missing)
+                t = threading.Thread(
+                    target=self._on_load_cwl_files,
+                    args=(
+                        missing,
+                        [self._cwl_paths[f] for f in missing],
+                        self._use_package
+                    )
+                )
+                t.daemon = True
+                t.start()
+
+            return bool(self._loading)
+
+    def _on_load_cwl_files(self, cwl_files, paths, use_package):
+        try:
+            load = partial(load_cwl_file, use_package=use_package)
+            if len(paths) > 1:
+                pool = ThreadPool(min(len(paths), _MAX_CWL_LOADERS))
+                try:
+                    results = pool.map(load, paths)
+                finally:
+                    pool.close()
+            else:
+                results = [load(paths[0])]
+        except:
+            traceback.print_exc()
+            results = [None] * len(paths)
+
+        with self._WLOCK:
+            for cwl_file, result in zip(cwl_files, results):
+                self._loading.discard(cwl_file)
+                # also remember cwl files which could not be loaded, so we
+                # do not try to load them again
+                if result is None:
+                    result = ((), ())
+                self._completions[cwl_file], \
+                    self._environment_completions[cwl_file] = result
+            self._generation += 1
+
+            if self._triggered and not self._loading:
+                self._triggered = False
+                sublime.set_timeout(self._hack, 0)
+
     # loads the list of currently specified cwl files
     def get_packages(self):
         packages = get_setting('cwl_list', [
@@ -171,29 +307,52 @@ class CwlCompletions(object):
         if get_setting('cwl_autoload', True):
             root = get_tex_root(sublime.active_window().active_view())
             if root is not None:
-                doc = analysis.get_analysis(root)
-
-                # really, there should only be one documentclass
-                packages.extend([
-                    'class-{0}'.format(documentclass.args)
-                    for documentclass in doc.filter_commands(
-                        'documentclass',
-                        analysis.ONLY_PREAMBLE |
-                        analysis.ONLY_COMMANDS_WITH_ARGS
-                    )
-                ])
-
-                packages.extend([
-                    package.args for package in doc.filter_commands(
-                        'usepackage',
-                        analysis.ONLY_PREAMBLE |
-                        analysis.ONLY_COMMANDS_WITH_ARGS
-                    )
-                ])
+                packages = packages + self._get_document_packages(root)
             # TODO - Attempt to read current buffer
 
         return packages
 
+    # returns the document class and the packages used in the preamble of
+    # the document; these are only extracted again if the analysis of the
+    # document changed
+    def _get_document_packages(self, root):
+        doc = analysis.get_analysis(root)
+        analysis_id = doc.analysis_id()
+        try:
+            cached_id, packages = self._document_packages[root]
+            if analysis_id is not None and cached_id == analysis_id:
+                return packages
+        except KeyError:
+            pass
+
+        # really, there should only be one documentclass
+        packages = [
+            'class-{0}'.format(documentclass.args)
+            for documentclass in doc.filter_commands(
+                'documentclass',
+                analysis.ONLY_PREAMBLE |
+                analysis.ONLY_COMMANDS_WITH_ARGS
+            )
+        ]
+
+        packages.extend([
+            package.args for package in doc.filter_commands(
+                'usepackage',
+                analysis.ONLY_PREAMBLE |
+                analysis.ONLY_COMMANDS_WITH_ARGS
+            )
+        ])
+
+        # typically, there are only a few documents open at a time
+        if (
+            root not in self._document_packages and
+            len(self._document_packages) >= _MAX_DOCUMENT_PACKAGES
+        ):
+            self._document_packages.clear()
+
+        self._document_packages[root] = (analysis_id, packages)
+        return packages
+
     # loads all available completions on a new background thread
     # set force to True to force completions to load regardless
     # of whether they have already been loaded
@@ -202,6 +361,11 @@ class CwlCompletions(object):
             if self._started or (self._completed and not force):
                 return
 
+            # in lazy mode, only load the cwl files of the current document
+            if is_cwl_lazy_loading() and not force:
+                self._load_cwl_files(self.get_cwl_files())
+                return
+
             self._started = True
             t = threading.Thread(
                 target=cwl_parsing_handler,
@@ -224,6 +388,7 @@ class CwlCompletions(object):
         with self._WLOCK:
             self._completions = completions
             self._environment_completions = environment_completions
+            self._generation += 1
             self._started = False
             self._completed = True
 
@@ -233,6 +398,59 @@ class CwlCompletions(object):
                 sublime.set_timeout(self._hack, 0)
 
 
+# the maximum number of merged completion lists kept by CwlCompletions
+_MAX_MERGED_COMPLETIONS = 16
+
+# the maximum number of documents whose packages are kept by CwlCompletions
+_MAX_DOCUMENT_PACKAGES = 16
+
+
+class CompletionIndex(object):
+    '''
+    the completions of several cwl files sorted by their keyword, ignoring
+    case and the leading backslash, so that the completions matching a
+    prefix can be found using binary search; like Sublime Text does, the
+    keywords only need to start with the first character of the prefix and
+    contain the others in order (see fuzzy_search_sorted())
+
+    packages is a list of the label of each cwl file and its completions
+    as returned by parse_cwl(); the completions are only formatted for
+    display, i.e., the keyword padded and the label appended, when they
+    are returned by search()
+    '''
+
+    def __init__(self, packages):
+        entries = []
+        for label, completions in packages:
+            for i in range(0, len(completions), 2):
+                keyword = completions[i]
+                entries.append((
+                    _completion_key(keyword), keyword, label,
+                    completions[i + 1]
+                ))
+        entries.sort(key=itemgetter(0))
+
+        self.keys = [entry[0] for entry in entries]
+        self.keywords = [entry[1] for entry in entries]
+        self.labels = [entry[2] for entry in entries]
+        self.insertions = [entry[3] for entry in entries]
+
+    def search(self, prefix=''):
+        prefix = prefix.lower().lstrip('\\')
+        return [
+            _format_completion(
+                self.keywords[i], self.labels[i], self.insertions[i])
+            for i in fuzzy_search_sorted(self.keys, prefix)
+        ]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _completion_key(keyword):
+    return keyword.lstrip('\\').lower()
+
+
 class LatexCwlCompletion(sublime_plugin.EventListener):
     '''
     Event listener to supply cwl completions at appropriate points
@@ -292,10 +510,10 @@ class LatexCwlCompletion(sublime_plugin.EventListener):
 
         # load the completions for the document
         if is_env:
-            completions = CWL_COMPLETIONS.get_completions(env=True) + \
-                get_own_env_completion(view)
+            completions = CWL_COMPLETIONS.get_completions(
+                env=True, prefix=prefix) + get_own_env_completion(view)
         else:
-            completions = CWL_COMPLETIONS.get_completions() + \
+            completions = CWL_COMPLETIONS.get_completions(prefix=prefix) + \
                 get_own_command_completion(view)
 
         # autocompleting with slash already on line
@@ -402,6 +620,18 @@ def _check_if_cwl_enabled(view=None):
 
 # -- Internal Parsing API --
 
+# prefix of the keys of the global cache entries which store the parsed
+# completions of each cwl file, see load_cwl_file()
+CWL_CACHE_PREFIX = 'cwl_'
+
+# increment this if the parsed completions change, e.g., if the format of
+# the completions or the snippets created by command_to_snippet change
+_CWL_CACHE_VERSION = 3
+
+# the maximum number of cwl files loaded at the same time in lazy mode
+_MAX_CWL_LOADERS = 4
+
+
 # this is the function called by the CwlCompletions class to handle parsing
 # it loads every cwl in turn and returns a dictionary mapping from the
 # cwl file name to the set of parsed completions
@@ -411,41 +641,81 @@ def cwl_parsing_handler(callback):
     cwl_files, use_package = get_cwl_package_files()
 
     for cwl_file in cwl_files:
+        result = load_cwl_file(cwl_file, use_package)
+        if result is None:
+            continue
+
         base_name = os.path.basename(cwl_file)
-        if use_package:
-            try:
-                s = (sublime.load_resource(cwl_file).replace("\r\n", "\n")
-                     .replace("\r", "\n"))
-            except IOError:
-                print(
-                    u'{0} does not exist or could not be accessed'.format(
-                        cwl_file
-                    )
-                )
-                continue
-        else:
-            if not os.path.isabs(cwl_file) and cwl_file.startswith('Package'):
-                cwl_file = os.path.normpath(
-                    cwl_file.replace('Package', sublime.packages_path())
-                )
+        completion_results[base_name], environment_results[base_name] = \
+            result
 
-            try:
-                s = utils.read_file_unix_endings(cwl_file)
-            except IOError:
-                print(
-                    u'{0} does not exist or could not be accessed'.format(
-                        cwl_file
-                    )
-                )
-                continue
+    callback(completion_results, environment_results)
 
-        completions = parse_cwl_file(base_name, s)
-        completion_results[base_name] = completions
 
-        environments = parse_cwl_file(base_name, s, parse_line_as_environment)
-        environment_results[base_name] = environments
+# loads the command and environment completions of a single cwl file
+#
+# the parsed completions of each cwl file are stored in the global cache
+# together with the digest of its content, so only new or changed cwl files
+# are parsed again; returns None if the cwl file cannot be read
+def load_cwl_file(cwl_file, use_package):
+    s = _read_cwl_file(cwl_file, use_package)
+    if s is None:
+        return None
+
+    digest = _md5(s)
+    key = CWL_CACHE_PREFIX + _md5(cwl_file)
+    try:
+        version, cached_digest, completions, environments = \
+            cache.read_global(key)
+        if version == _CWL_CACHE_VERSION and cached_digest == digest:
+            return completions, environments
+    except cache.CacheMiss:
+        pass
+    except:
+        traceback.print_exc()
+
+    completions, environments = parse_cwl(s)
+
+    try:
+        cache.write_global(
+            key, (_CWL_CACHE_VERSION, digest, completions, environments))
+    except:
+        traceback.print_exc()
+
+    return completions, environments
+
+
+def _md5(s):
+    if not isinstance(s, bytes):
+        s = s.encode('utf-8')
+    return hashlib.md5(s).hexdigest()
+
+
+def _read_cwl_file(cwl_file, use_package):
+    # returns the content of the cwl file or None if it cannot be read
+    if use_package:
+        try:
+            return (sublime.load_resource(cwl_file).replace("\r\n", "\n")
+                    .replace("\r", "\n"))
+        except IOError:
+            pass
+    else:
+        if not os.path.isabs(cwl_file) and cwl_file.startswith('Package'):
+            cwl_file = os.path.normpath(
+                cwl_file.replace('Package', sublime.packages_path())
+            )
 
-    callback(completion_results, environment_results)
+        try:
+            return utils.read_file_unix_endings(cwl_file)
+        except IOError:
+            pass
+
+    print(
+        u'{0} does not exist or could not be accessed'.format(
+            cwl_file
+        )
+    )
+    return None
 
 
 # gets a list of all cwl package files available, whether in the
@@ -490,6 +760,60 @@ def parse_cwl_file(cwl, s, parse_line=parse_line_as_command):
     completions = []
     method = os.path.splitext(cwl)[0]
 
+    for line in _get_cwl_lines(s):
+        result = parse_line(line)
+        if result is None:
+            continue
+
+        completions.append(_make_completion(result, method))
+
+    return completions
+
+
+# parses the commands and the environments of a cwl file in a single pass;
+# returns a tuple of the command and the environment completions
+#
+# to keep the completions of all cwl files in memory, the completions of
+# each are stored compactly as a flat tuple of alternating keywords and
+# snippets, in which equal strings, e.g. a snippet which is the same as
+# its keyword, are only stored once; use _format_completion() to create the
+# completions displayed to the user
+def parse_cwl(s):
+    completions = []
+    environments = []
+    strings = {}
+
+    for line in _get_cwl_lines(s):
+        result = parse_line_as_command(line)
+        if result is not None:
+            _add_completion(completions, result, strings)
+
+        result = parse_line_as_environment(line)
+        if result is not None:
+            _add_completion(environments, result, strings)
+
+    return tuple(completions), tuple(environments)
+
+
+def _add_completion(completions, result, strings):
+    keyword, insertion = result
+    completions.append(strings.setdefault(keyword, keyword))
+    completions.append(strings.setdefault(insertion, insertion))
+
+
+def _make_completion(result, method):
+    keyword, insertion = result
+    return _format_completion(keyword, method, insertion)
+
+
+def _format_completion(keyword, label, insertion):
+    # pad the keyword with spaces; this is to keep the size of the
+    # autocompletions consistent regardless of the returned results
+    return (u'%s\t%s' % (keyword.ljust(50), label), insertion)
+
+
+# yields the lines of a cwl file which define commands or environments
+def _get_cwl_lines(s):
     # we need some state tracking to ignore keyval data
     # it could be useful at a later date
     KEYVAL = False
@@ -519,19 +843,7 @@ def parse_cwl_file(cwl, s, parse_line=parse_line_as_command):
         # a # char
         line = line.rstrip()
 
-        result = parse_line(line)
-        if result is None:
-            continue
-        keyword, insertion = result
-
-        # pad the keyword with spaces; this is to keep the size of the
-        # autocompletions consistent regardless of the returned results
-        keyword = keyword.ljust(50)
-
-        item = (u'%s\t%s' % (keyword, method), insertion)
-        completions.append(item)
-
-    return completions
+        yield line
 
 
 # ensure that CWL_COMPLETIONS has a value
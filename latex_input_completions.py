@@ -7,6 +7,7 @@ import sublime_plugin
 import os
 import re
 import json
+import threading
 
 try:
     from latex_fill_all import FillAllHelper
@@ -28,10 +29,12 @@ if sublime.version() < '3000':
     _ST3 = False
     import getTeXRoot
     from latextools_utils import get_setting
+    from latextools_utils.utils import fuzzy_search_sorted
 else:
     _ST3 = True
     from . import getTeXRoot
     from .latextools_utils import get_setting
+    from .latextools_utils.utils import fuzzy_search_sorted
 
 
 def _filter_invalid_entries(entries):
@@ -246,7 +249,7 @@ def _get_dyn_entries():
         return [], None
 
 
-def parse_completions(view, line):
+def parse_completions(view, line, prefix=''):
     # reverse line, copied from latex_cite_completions, very cool :)
     line = line[::-1]
 
@@ -318,7 +321,9 @@ def parse_completions(view, line):
     elif entry["type"] == "cached":
         cache = _get_cache()
         if cache is not None:
-            completions = cache.get(entry["cache_name"])
+            names = cache.get(entry["cache_name"])
+            if names is not None:
+                completions = names.search(prefix)
     else:
         print("Unknown entry type {0}.".format(entry["type"]))
 
@@ -331,7 +336,48 @@ def parse_completions(view, line):
     return completions
 
 
+def _get_argument_prefix(line):
+    # the part of the current argument before the cursor; unlike the prefix
+    # passed by Sublime Text, this includes non-word characters, e.g. "-"
+    return re.split(r'[{,\s]', line)[-1]
+
+
+class SortedNames(object):
+    '''
+    a list of names sorted case-insensitively, which can be searched for
+    the names matching a prefix using binary search
+    '''
+
+    def __init__(self, names):
+        decorated = sorted((name.lower(), name) for name in names)
+        self.keys = [key for key, _ in decorated]
+        self.names = [name for _, name in decorated]
+
+    def search(self, prefix=''):
+        '''
+        returns all names matching prefix, ignoring case; like Sublime Text
+        does, the names only need to start with the first character of the
+        prefix and contain the others in order (see fuzzy_search_sorted())
+        '''
+        names = self.names
+        return [
+            names[i] for i in fuzzy_search_sorted(self.keys, prefix.lower())
+        ]
+
+    def __len__(self):
+        return len(self.names)
+
+
+# the parsed package cache and the modification time and size of the file
+# it was read from; the file is only parsed again if it changed
+_pkg_cache = None
+_pkg_cache_stamp = None
+_pkg_cache_lock = threading.Lock()
+
+
 def _get_cache():
+    global _pkg_cache, _pkg_cache_stamp
+
     if _ST3:
         cache_path = os.path.normpath(
             os.path.join(sublime.cache_path(), "LaTeXTools"))
@@ -344,7 +390,9 @@ def _get_cache():
                      if _ST3 else 'latextools_pkg_cache.cache'))
 
     cache = None
-    if not os.path.exists(pkg_cache_file):
+    try:
+        st = os.stat(pkg_cache_file)
+    except OSError:
         gen_cache = sublime.ok_cancel_dialog(
             "Cache files for installed packages, "
             "classes and bibliographystyles do not exists, "
@@ -355,15 +403,27 @@ def _get_cache():
         if gen_cache:
             sublime.active_window().run_command("latex_gen_pkg_cache")
     else:
-        with open(pkg_cache_file) as f:
-            cache = json.load(f)
+        stamp = (st.st_mtime, st.st_size)
+        with _pkg_cache_lock:
+            if stamp == _pkg_cache_stamp:
+                return _pkg_cache
+
+            with open(pkg_cache_file) as f:
+                cache = dict(
+                    (key, SortedNames(value))
+                    for key, value in json.load(f).items()
+                )
+
+            _pkg_cache = cache
+            _pkg_cache_stamp = stamp
     return cache
 
 
 class InputFillAllHelper(FillAllHelper):
 
     def get_auto_completions(self, view, prefix, line):
-        completions = parse_completions(view, line)
+        completions = parse_completions(
+            view, line, _get_argument_prefix(line))
 
         if len(completions) == 0:
             return []
@@ -3,13 +3,16 @@ from __future__ import print_function
 import sublime
 import sublime_plugin
 
+import io
 import os
 import json
 
 from collections import defaultdict
 
 from functools import partial
+from multiprocessing.pool import ThreadPool
 import threading
+import time
 import traceback
 
 if sublime.version() < '3000':
@@ -17,6 +20,7 @@ if sublime.version() < '3000':
     _ST3 = False
     strbase = basestring
 
+    from latextools_utils import cache
     from latextools_utils.external_command import (
         check_output, CalledProcessError
     )
@@ -24,6 +28,7 @@ else:
     _ST3 = True
     strbase = str
 
+    from .latextools_utils import cache
     from .latextools_utils.external_command import (
         check_output, CalledProcessError
     )
@@ -67,34 +72,272 @@ def _get_tex_searchpath(file_type):
     return None
 
 
-def _get_files_matching_extensions(paths, extensions=[]):
+# the names of the filename databases of a TEXMF tree
+_LS_R_NAMES = ('ls-R', 'ls-r')
+
+# key of the global cache entry which stores the files found in each ls-R
+# file, see _get_ls_r_files()
+_LS_R_CACHE_KEY = 'ls_r_databases'
+
+
+def _find_ls_r(path):
+    '''
+    returns the path of the ls-R file of the TEXMF tree containing path or
+    None if the tree has no ls-R file
+    '''
+    path = os.path.abspath(path)
+    while True:
+        for name in _LS_R_NAMES:
+            candidate = os.path.join(path, name)
+            if os.path.isfile(candidate):
+                return candidate
+
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _parse_ls_r(ls_r, extensions):
+    '''
+    returns a dict mapping each directory listed in the ls-R file to the
+    names of the files in it matching one of the extensions
+    '''
+    root = os.path.dirname(ls_r)
+    suffixes = tuple(u''.join((os.extsep, ext)) for ext in extensions)
+
+    dirs = {}
+    current = root
+    with io.open(ls_r, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip(u'\r\n')
+            if not line or line.startswith(u'%'):
+                continue
+
+            # a line ending with a colon starts the list of files of a
+            # directory, which is usually relative to the root of the tree
+            if line.endswith(u':'):
+                current = line[:-1]
+                if not os.path.isabs(current):
+                    current = os.path.join(root, current)
+                current = os.path.normpath(current)
+            elif line.endswith(suffixes):
+                try:
+                    dirs[current].append(line)
+                except KeyError:
+                    dirs[current] = [line]
+
+    return dirs
+
+
+def _get_ls_r_files(ls_r, extensions, databases):
+    '''
+    returns the files of the ls-R file as returned by _parse_ls_r(); the
+    result is stored in databases together with the modification time and
+    size of the ls-R file, so the file is only parsed again if it changed
+
+    returns None if the ls-R file cannot be read
+    '''
+    key = (ls_r, tuple(sorted(extensions)))
+    try:
+        st = os.stat(ls_r)
+    except OSError:
+        return None
+    stamp = (st.st_mtime, st.st_size)
+
+    try:
+        cached_stamp, dirs = databases[key]
+        if cached_stamp == stamp:
+            return dirs
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    try:
+        dirs = _parse_ls_r(ls_r, extensions)
+    except (IOError, OSError):
+        traceback.print_exc()
+        return None
+
+    databases[key] = (stamp, dirs)
+    return dirs
+
+
+# the maximum number of trees walked at the same time
+_MAX_WALKERS = 8
+
+# key of the global cache entry which stores the directories visited while
+# walking the TEXMF trees, see _walk_tree()
+_WALK_CACHE_KEY = 'texmf_walk_cache'
+
+try:
+    _scandir = os.scandir
+except AttributeError:
+    _scandir = None
+
+
+def _list_dir(path):
+    '''
+    returns the names of the files in path and the paths of its
+    subdirectories; like os.walk(), symbolic links to directories are
+    neither returned nor followed
+    '''
+    files = []
+    subdirs = []
+    if _scandir is not None:
+        for entry in _scandir(path):
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                else:
+                    files.append(entry.name)
+            except OSError:
+                continue
+    else:
+        for name in os.listdir(path):
+            full_path = os.path.join(path, name)
+            if os.path.isdir(full_path):
+                if not os.path.islink(full_path):
+                    subdirs.append(full_path)
+            else:
+                files.append(name)
+    return files, subdirs
+
+
+def _walk_tree(top, extensions, cached):
+    '''
+    walks the tree top and returns a dict mapping each of the extensions to
+    the names (without extension) of the files with that extension and a
+    dict with the entries of all visited directories for the walk cache
+
+    cached is the walk cache of a previous run; it maps the path of each
+    directory to its modification time, the names of the matching files in
+    it and its subdirectories; directories which were not modified since
+    are not listed again
+    '''
+    matched = defaultdict(lambda: [])
+    visited = {}
+    now = time.time()
+
+    stack = [top]
+    while stack:
+        path = stack.pop()
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+
+        entry = cached.get(path)
+        if entry is not None and entry[0] == mtime:
+            _, files, subdirs = entry
+        else:
+            try:
+                names, subdirs = _list_dir(path)
+            except OSError:
+                continue
+
+            files = tuple(
+                name for name in names
+                if os.path.splitext(name)[1][1:] in extensions
+            )
+            subdirs = tuple(subdirs)
+
+            # the resolution of the mtime may be too low to notice changes
+            # made right after the directory was listed
+            if now - mtime < 2:
+                mtime = None
+
+        visited[path] = (mtime, files, subdirs)
+        for f in files:
+            name, ext = os.path.splitext(f)
+            matched[ext[1:]].append(name)
+        stack.extend(subdirs)
+
+    return matched, visited
+
+
+def _get_files_matching_extensions(paths, extensions=[], databases=None,
+                                   walk_cache=None):
     if isinstance(extensions, strbase):
         extensions = [extensions]
+    extension_set = frozenset(extensions)
 
     matched_files = defaultdict(lambda: [])
 
+    def add_file(f):
+        name, ext = os.path.splitext(f)
+        ext = ext[1:]
+        if ext in extension_set:
+            matched_files[ext].append(name)
+
+    trees = []
     for path in paths.split(os.pathsep):
         # our current directory isn't usually meaningful from a WindowCommand
         if path == '.':
             continue
 
-        # !! sometimes occurs in the results on POSIX; remove them
+        # !! marks the trees which are only searched using their ls-R file
+        ls_r_only = path.startswith(u'!!')
         path = path.replace(u'!!', u'')
         path = os.path.normpath(path)
         if not os.path.exists(path):  # ensure path exists
             continue
 
+        # use the filename database of the tree if only that is searched;
+        # this is much faster than walking the tree, which can contain
+        # thousands of directories; the other trees are walked, since the
+        # files added since the ls-R file was generated are found as well
+        if ls_r_only and len(extensions) > 0 and databases is not None:
+            ls_r = _find_ls_r(path)
+            dirs = None
+            if ls_r is not None:
+                dirs = _get_ls_r_files(ls_r, extensions, databases)
+
+            if dirs is not None:
+                prefix = os.path.normcase(os.path.join(path, u''))
+                normalized_path = os.path.normcase(path)
+                for d, files in dirs.items():
+                    d = os.path.normcase(d)
+                    if d == normalized_path or d.startswith(prefix):
+                        for f in files:
+                            add_file(f)
+                continue
+
         if len(extensions) > 0:
-            for _, _, files in os.walk(path):
-                for f in files:
-                    for ext in extensions:
-                        if f.endswith(u''.join((os.extsep, ext))):
-                            matched_files[ext].append(os.path.splitext(f)[0])
+            trees.append(path)
         else:
             for _, _, files in os.walk(path):
                 for f in files:
                     matched_files['*'].append(os.path.splitext(f)[0])
 
+    if trees:
+        # walk the trees in parallel, most of the time is spent waiting for
+        # the file system
+        cache_key = tuple(sorted(extension_set))
+        cached = {}
+        if walk_cache is not None:
+            cached = walk_cache.get(cache_key) or {}
+
+        walk = partial(_walk_tree, extensions=extension_set, cached=cached)
+        if len(trees) > 1:
+            pool = ThreadPool(min(len(trees), _MAX_WALKERS))
+            try:
+                results = pool.map(walk, trees)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [walk(trees[0])]
+
+        visited = {}
+        for matched, tree_visited in results:
+            for ext, names in matched.items():
+                matched_files[ext].extend(names)
+            visited.update(tree_visited)
+
+        if walk_cache is not None:
+            walk_cache[cache_key] = visited
+
     matched_files = dict([(key, sorted(set(value), key=lambda s: s.lower()))
         for key, value in matched_files.items()])
 
@@ -102,16 +345,42 @@ def _get_files_matching_extensions(paths, extensions=[]):
 
 
 def _generate_package_cache():
+    # the ls-R files are only parsed again if they changed since the cache
+    # was last generated
+    databases = cache.read_global_dict(_LS_R_CACHE_KEY)
+    stamps = dict((key, value[0]) for key, value in databases.items())
+    # likewise, only the directories of the trees without an ls-R file that
+    # changed are listed again
+    walk_cache = cache.read_global_dict(_WALK_CACHE_KEY)
+
     installed_tex_items = _get_files_matching_extensions(
         _get_tex_searchpath('tex'),
-        ['sty', 'cls']
+        ['sty', 'cls'],
+        databases,
+        walk_cache
     )
 
     installed_bst = _get_files_matching_extensions(
         _get_tex_searchpath('bst'),
-        ['bst']
+        ['bst'],
+        databases,
+        walk_cache
     )
 
+    # drop the files of ls-R files which no longer exist
+    for key in list(databases.keys()):
+        if not os.path.exists(key[0]):
+            del databases[key]
+
+    try:
+        if stamps != dict(
+            (key, value[0]) for key, value in databases.items()
+        ):
+            cache.write_global(_LS_R_CACHE_KEY, databases)
+        cache.write_global(_WALK_CACHE_KEY, walk_cache)
+    except:
+        traceback.print_exc()
+
     # create the cache object
     pkg_cache = {
         'pkg': installed_tex_items['sty'],
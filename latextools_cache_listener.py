@@ -5,6 +5,7 @@ import sublime_plugin
 
 import collections
 from functools import partial
+import os
 import threading
 import traceback
 
@@ -12,7 +13,7 @@ try:
     from .latex_cite_completions import (
         find_bib_files, run_plugin_command
     )
-    from .latextools_utils import analysis, get_setting
+    from .latextools_utils import analysis, bibcache, get_setting
     from .latextools_utils.bibcache import BibCache
     from .latextools_utils.cache import LocalCache
     from .latextools_utils.tex_directives import get_tex_root
@@ -21,7 +22,7 @@ except:
     from latex_cite_completions import (
         find_bib_files, run_plugin_command
     )
-    from latextools_utils import analysis, get_setting
+    from latextools_utils import analysis, bibcache, get_setting
     from latextools_utils.bibcache import BibCache
     from latextools_utils.cache import LocalCache
     from latextools_utils.tex_directives import get_tex_root
@@ -84,6 +85,110 @@ class LatextoolsBibCacheUpdater(LatextoolsCacheUpdater):
         run_plugin_command('get_entries', *(find_bib_files(tex_root) or []))
 
 
+class BibWatcher(object):
+    '''
+    watches the bib files of the open documents in a background thread and
+    re-parses them as soon as they change, so that the cite completions do
+    not have to
+
+    the bib files of each watched tex root are found using find_bib_files()
+    and their modification times are polled every
+    `bibliography_watcher_interval` seconds
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+        self._root_refs = collections.defaultdict(lambda: 0)
+        self._bib_files = {}
+        self._mtimes = {}
+        self._outdated = set()
+
+    def watch(self, tex_root):
+        with self._lock:
+            self._root_refs[tex_root] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._running = True
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+
+    def unwatch(self, tex_root):
+        with self._lock:
+            self._root_refs[tex_root] -= 1
+            if self._root_refs[tex_root] <= 0:
+                del self._root_refs[tex_root]
+                self._bib_files.pop(tex_root, None)
+
+    def refresh(self, bib_file):
+        '''
+        requests to re-parse the bib file as soon as possible; raises a
+        ValueError if the bib file is not watched
+        '''
+        with self._lock:
+            if not self._running or not any(
+                bib_file in bib_files for bib_files in self._bib_files.values()
+            ):
+                raise ValueError(u'{0} is not watched'.format(bib_file))
+            self._outdated.add(bib_file)
+        self._wakeup.set()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(get_setting('bibliography_watcher_interval', 5))
+            self._wakeup.clear()
+
+            with self._lock:
+                tex_roots = list(self._root_refs)
+
+            for tex_root in tex_roots:
+                if not self._running:
+                    return
+                try:
+                    self._check(tex_root)
+                except:
+                    traceback.print_exc()
+
+    def _check(self, tex_root):
+        bib_files = find_bib_files(tex_root)
+        if not bib_files:
+            return
+
+        changed = False
+        with self._lock:
+            if tex_root not in self._root_refs:
+                return
+            self._bib_files[tex_root] = bib_files
+
+            for bib_file in bib_files:
+                try:
+                    mtime = os.path.getmtime(bib_file)
+                except OSError:
+                    mtime = None
+
+                if (
+                    bib_file in self._outdated or
+                    self._mtimes.get(bib_file, -1) != mtime
+                ):
+                    changed = True
+                self._mtimes[bib_file] = mtime
+                self._outdated.discard(bib_file)
+
+        if changed:
+            with bibcache.refreshing():
+                run_plugin_command('get_entries', *bib_files)
+
+
+_bib_watcher = BibWatcher()
+
+
 class LatextoolsCacheUpdateListener(
     sublime_plugin.EventListener, LatextoolsAnalysisUpdater,
     LatextoolsBibCacheUpdater
@@ -94,10 +199,35 @@ class LatextoolsCacheUpdateListener(
     _TEX_CACHES = {}
     _TEX_ROOT_REFS = collections.defaultdict(lambda: 0)
     _BIB_CACHES = {}
+    # the tex root of each open LaTeX view whose bib files are watched
+    _WATCHED_VIEWS = {}
+
+    def watch_bibliography(self, view):
+        _id = view.id()
+        if _id in self._WATCHED_VIEWS:
+            return
+        if not get_setting('bibliography_watcher', True, view=view):
+            return
+
+        tex_root = get_tex_root(view)
+        if tex_root is None:
+            return
+
+        self._WATCHED_VIEWS[_id] = tex_root
+        _bib_watcher.watch(tex_root)
+
+    def on_activated_async(self, view):
+        if not view.score_selector(0, 'text.tex.latex'):
+            return
+
+        self.watch_bibliography(view)
 
     def on_load_async(self, view):
         if not view.score_selector(0, 'text.tex.latex'):
             return
+
+        self.watch_bibliography(view)
+
         on_load = get_setting('cache_on_load', {}, view=view)
         if not on_load or not any(on_load.values()):
             return
@@ -151,6 +281,11 @@ class LatextoolsCacheUpdateListener(
 
         _id = view.id()
 
+        try:
+            _bib_watcher.unwatch(self._WATCHED_VIEWS.pop(_id))
+        except KeyError:
+            pass
+
         try:
             tex_root = self._TEX_CACHES[_id].tex_root
             self._TEX_ROOT_REFS[tex_root] -= 1
@@ -194,6 +329,7 @@ class LatextoolsCacheUpdateListener(
         self.run_cache_update()
 
     if not _ST3:
+        on_activated = on_activated_async
         on_load = on_load_async
         on_post_save = on_post_save_async
 
@@ -244,3 +380,18 @@ class LatextoolsBibcacheUpdateCommand(
 
         self.run_bib_cache(tex_root)
         self.run_cache_update()
+
+
+def plugin_loaded():
+    # completions use the last parsed entries of a changed bib file while it
+    # is re-parsed by the watcher
+    bibcache.set_refresh_handler(_bib_watcher.refresh)
+
+
+def plugin_unloaded():
+    bibcache.set_refresh_handler(None)
+    _bib_watcher.stop()
+
+
+if not _ST3:
+    plugin_loaded()
@@ -4,6 +4,7 @@ import re
 import itertools
 from functools import partial
 import traceback
+import uuid
 
 import sublime
 
@@ -132,12 +133,22 @@ class Analysis(object):
 
         self._import_base_paths = {}
 
+        self._id = uuid.uuid4().hex
+
         self.__frozen = False
 
     def tex_root(self):
         """The tex root of the analysis"""
         return self._tex_root
 
+    def analysis_id(self):
+        """
+        A unique id of the analysis, which is kept when the analysis is
+        cached, so that values derived from it can be cached as well
+        (None for analyses cached by older versions)
+        """
+        return getattr(self, '_id', None)
+
     def tex_base_path(self, file_path):
         """
         The folder in which the file is seen by the latex compiler.
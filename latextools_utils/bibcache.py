@@ -1,22 +1,30 @@
+import collections
+import contextlib
+import hashlib
 import os
+import threading
 import time
 import traceback
+import weakref
 
 import sublime
 
 if sublime.version() < '3000':
     _ST3 = False
-    from latextools_utils import bibformat, cache, get_setting
+    from latextools_utils import (
+        bibformat, bibindex, bibtable, cache, get_setting
+    )
     from external.frozendict import frozendict
+    from latextools_utils.six import strbase
     from latextools_utils.system import make_dirs
 else:
     _ST3 = True
-    from . import bibformat, cache, get_setting
+    from . import bibformat, bibindex, bibtable, cache, get_setting
     from ..external.frozendict import frozendict
-    from .six import long
+    from .six import long, strbase
     from .system import make_dirs
 
-_VERSION = 2
+_VERSION = 5
 
 
 class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
@@ -30,20 +38,73 @@ class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
     note that the bibliography entries themselves are NOT stored in the
     in-memory cache which ONLY stores the formatted entries; instead,
     they are read from disk as necessary
+
+    the formatted entries are lazy: the fields used to search them are
+    created up front, but the panel and autocomplete formats are only
+    applied when they are first accessed; the results are memoized per
+    entry and format string and only the entries that have actually been
+    formatted are persisted, in a cache file of their own, so that the
+    formatted entries are not written again whenever entries are formatted
+
+    both the bibliography entries and the fields used for searching are
+    stored as a bibtable.EntryTable where possible, which keeps the cache
+    files small and quick to load
+
+    the cache files are named after the digest of the content of the bib
+    file rather than its path, so that identical bib files, e.g. the same
+    file copied into several projects, share the cached data
+
+    if the bib file changed and a refresh handler is registered (see
+    set_refresh_handler()), get() returns the last entries it returned for
+    the file instead of failing and requests a refresh in the background
     '''
 
     def __init__(self, bib_plugin_name, bib_file):
         self._inst_name = (bib_plugin_name, bib_file)
         super(BibCache, self).__init__()
 
-        file_hash = cache.hash_digest(bib_file)
+        self.bib_plugin_name = bib_plugin_name
         self.bib_file = bib_file
-        self.cache_name = "bib_{0}_{1}".format(bib_plugin_name, file_hash)
-        self.formatted_cache_name = "bib_{0}_fmt_{1}".format(
-            bib_plugin_name, file_hash
-        )
+        if not hasattr(self, '_content_digest'):
+            self._content_digest = None
+            self.cache_name = None
+            self.formatted_cache_name = None
+            self.index_cache_name = None
+            self.memo_cache_name = None
+            # the entries and index last returned for this bib file
+            self._last_good = None
+            self._stale = False
+            # digests of previous contents of the bib file whose cache
+            # files have not been removed yet
+            self._obsolete_digests = set()
+            # whether a save of the memoized values is pending
+            self._memo_save_pending = False
+
+        try:
+            self._update_cache_names()
+        except cache.CacheMiss:
+            pass
+
+        # the formatter is only referenced weakly by the (shared) state of
+        # the cache; it is kept alive by the entries it formatted
+        if not hasattr(self, '_formatter_ref'):
+            self._formatter_ref = None
 
     def get(self):
+        try:
+            entries = self._get_entries()
+        except cache.CacheMiss:
+            entries = self._get_last_good()
+            self._stale = True
+        else:
+            self._stale = False
+            self._last_good = (entries, None)
+            self._remove_obsolete_files()
+        return entries
+
+    def _get_entries(self):
+        self._update_cache_names()
+
         try:
             result = self._objects[self.formatted_cache_name]
         except KeyError:
@@ -51,36 +112,99 @@ class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
                 result = self.load(self.formatted_cache_name)
             except cache.CacheMiss:
                 result = None
+            else:
+                self._load_memo(result)
 
         try:
-            return self.validate_on_get(result)
+            self.validate_on_get(result)
         except cache.CacheMiss:
-            return self._get_bib_cache()[1]
+            self._get_bib_cache()
+
+        return self._get_formatter().entries
 
     def set(self, bib_entries):
+        self._update_cache_names()
+        cache_name = self.cache_name
+
         def _write_bib_cache():
+            # store the entries in columnar form if possible
+            table = bibtable.EntryTable.from_entries(bib_entries)
+            obj = bib_entries if table is None else table
             try:
-                cache.pickle.dumps(bib_entries, protocol=-1)
+                cache.pickle.dumps(obj, protocol=-1)
             except cache.pickle.PicklingError:
                 print('bib_entries must be pickleable')
                 traceback.print_exc()
             else:
                 with self._disk_lock:
                     make_dirs(self.cache_path)
-                    self._write(
-                        self.cache_name,
-                        {self.cache_name: bib_entries}
-                    )
+                    self._write(cache_name, {cache_name: obj})
 
         # write bib_entries to disk
         self._pool.apply_async(_write_bib_cache)
 
-        formatted_entries = self._create_formatted_entries(bib_entries)
+        self._store_formatted_entries(bib_entries)
 
-        with self._write_lock:
-            self._objects[self.formatted_cache_name] = formatted_entries
-            self._dirty = True
-        self._schedule_save()
+    def get_bib_entries(self):
+        '''
+        returns the bibliography entries as stored in the cache, i.e.,
+        before they are formatted, without parsing the bib file; these are
+        either a bibtable.EntryTable or a list of entries
+
+        raises a CacheMiss if the entries of the current content of the bib
+        file are not cached
+        '''
+        self._update_cache_names()
+        # the entries just parsed may not have been written to disk yet
+        bib_entries = getattr(self, '_pending_bib_entries', None)
+        if bib_entries is not None:
+            return bib_entries
+        return self._read(self.cache_name)
+
+    def get_index(self):
+        '''
+        returns the BibIndex for the formatted entries returned by get() or
+        None if there are no valid formatted entries
+
+        the index is created together with the formatted entries; if it
+        cannot be found, e.g. because it was not persisted yet, it is
+        recreated from the formatted entries
+        '''
+        if self._stale:
+            return self._last_good[1]
+
+        try:
+            meta_data, search_entries, _ = \
+                self._objects[self.formatted_cache_name]
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        try:
+            index = self._objects[self.index_cache_name]
+        except KeyError:
+            try:
+                index = self.load(self.index_cache_name)
+            except cache.CacheMiss:
+                index = None
+
+        if (
+            not isinstance(index, bibindex.BibIndex) or
+            index.cache_time != meta_data['cache_time'] or
+            len(index) != len(search_entries)
+        ):
+            index = bibindex.BibIndex.from_entries(
+                search_entries, meta_data['cache_time'])
+            with self._write_lock:
+                self._objects[self.index_cache_name] = index
+                self._dirty = True
+                self._dirty_keys.add(self.index_cache_name)
+            self._schedule_save()
+
+        last_good = self._last_good
+        if last_good is not None and last_good[1] is None:
+            self._last_good = (last_good[0], index)
+
+        return index
 
     def cache(self, func):
         try:
@@ -94,23 +218,43 @@ class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
         if obj is None:
             raise cache.CacheMiss()
 
-        meta_data, formatted_entries = obj
-
         try:
-            mtime = os.path.getmtime(self.bib_file)
-        except:
-            raise cache.CacheMiss()
-        else:
-            if mtime > meta_data['cache_time']:
-                raise cache.CacheMiss('outdated formatted entries')
+            meta_data, search_entries, memo = obj
+        except (TypeError, ValueError):
+            raise cache.CacheMiss('invalid formatted entries')
 
-        if _VERSION != meta_data['version'] or any(
-            meta_data[s] != get_setting("cite_" + s)
-            for s in ["panel_format", "autocomplete_format"]
+        # since the cache is named after the content of the bib file, the
+        # entries are outdated only if the format changed
+        if _VERSION != meta_data['version']:
+            raise cache.CacheMiss('outdated cache version')
+
+        autocomplete_format, panel_format = _get_formats()
+        if (
+            meta_data['autocomplete_format'] != autocomplete_format or
+            meta_data['panel_format'] != panel_format
         ):
-            return self._get_bib_cache()[1]
+            # only drop the memoized values for formats no longer in use
+            # the entries are formatted again as they are accessed
+            formats = set(panel_format)
+            formats.add(autocomplete_format)
+            meta_data = frozendict(
+                meta_data,
+                autocomplete_format=autocomplete_format,
+                panel_format=panel_format
+            )
+            with self._write_lock:
+                for format_string in list(memo.keys()):
+                    if format_string not in formats:
+                        del memo[format_string]
+                self._objects[self.formatted_cache_name] = (
+                    meta_data, search_entries, memo)
+                self._dirty = True
+                self._dirty_keys.add(self.formatted_cache_name)
+            self._schedule_save()
+
+            self._formatter_ref = None
 
-        return formatted_entries
+        return search_entries
 
     def _get_inst_key(self, *args, **kwargs):
         if not hasattr(self, '_inst_name'):
@@ -121,31 +265,188 @@ class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
         else:
             return self._inst_name
 
-    def _get_bib_cache(self):
-        try:
-            cache_mtime = os.path.getmtime(
-                os.path.join(self.cache_path, self.cache_name))
+    def _get_last_good(self):
+        # outdated entries are only returned if they are refreshed in the
+        # background, and never to the refresh itself
+        last_good = self._last_good
+        if (
+            last_good is None or
+            _refresh_handler is None or
+            is_refreshing()
+        ):
+            raise cache.CacheMiss()
 
-            bib_mtime = os.path.getmtime(self.bib_file)
+        try:
+            _refresh_handler(self.bib_file)
+        except ValueError:
+            # the bib file cannot be refreshed in the background
+            raise cache.CacheMiss()
         except:
+            traceback.print_exc()
             raise cache.CacheMiss()
-        else:
-            if cache_mtime < bib_mtime:
-                raise cache.CacheMiss('outdated bib entry cache')
 
+        return last_good[0]
+
+    def _update_cache_names(self):
+        # (re-)derives the names of the cache files from the content of the
+        # bib file; if the bib file was changed, the in-memory data for the
+        # previous content is dropped
+        try:
+            digest = get_content_digest(self.bib_file)
+        except (IOError, OSError):
+            raise cache.CacheMiss(
+                u'cannot read {0}'.format(self.bib_file))
+
+        if digest == self._content_digest:
+            return
+
+        # the cache files for the previous content are still needed to
+        # format the outdated entries returned by get(), so they are only
+        # removed once the entries for the current content are returned
+        if self._content_digest is not None:
+            self._obsolete_digests.add(self._content_digest)
+        self._obsolete_digests.discard(digest)
+
+        with self._write_lock:
+            for name in (
+                self.cache_name, self.formatted_cache_name,
+                self.index_cache_name, self.memo_cache_name
+            ):
+                self._objects.pop(name, None)
+
+            (
+                self.cache_name, self.formatted_cache_name,
+                self.index_cache_name, self.memo_cache_name
+            ) = _get_cache_names(self.bib_plugin_name, digest)
+            self._content_digest = digest
+
+        self._formatter_ref = None
+        self._pending_bib_entries = None
+
+    def _remove_obsolete_files(self):
+        # removes the cache files for previous contents of the bib file,
+        # unless another bib file still has the same content
+        if not self._obsolete_digests:
+            return
+
+        obsolete = set(self._obsolete_digests)
+        self._obsolete_digests.clear()
+
+        with _content_digests_lock:
+            for path, (_, digest) in list((_content_digests or {}).items()):
+                if digest not in obsolete:
+                    continue
+                # bib files which were removed do not keep their digest
+                if os.path.exists(path):
+                    obsolete.discard(digest)
+                else:
+                    del _content_digests[path]
+
+        with self._disk_lock:
+            for digest in obsolete:
+                for name in _get_cache_names(self.bib_plugin_name, digest):
+                    try:
+                        os.remove(os.path.join(self.cache_path, name))
+                    except OSError:
+                        pass
+
+    def _get_bib_cache(self):
         bib_entries = self._read(self.cache_name)
-        formatted_entries = self._create_formatted_entries(bib_entries)
+        return self._store_formatted_entries(bib_entries)
+
+    def _get_bib_entries(self, cache_name):
+        # the bibliography entries needed to format an entry; these are
+        # read from disk when the first entry is formatted
+        bib_entries = getattr(self, '_pending_bib_entries', None)
+        if bib_entries is not None and cache_name == self.cache_name:
+            self._pending_bib_entries = None
+            return bib_entries
+        return self._read(cache_name)
+
+    def _schedule_memo_save(self):
+        # saves the memoized values on their own shortly after values are
+        # memoized, so that formatting entries does not write the whole cache
+        with self._write_lock:
+            if self._memo_save_pending:
+                return
+            self._memo_save_pending = True
+        threading.Timer(0.5, self._save_memo).start()
+
+    def _save_memo(self):
+        # the memo is stored with the creation time of the formatted entries
+        # it belongs to, see _load_memo()
+        with self._disk_lock:
+            with self._write_lock:
+                self._memo_save_pending = False
+                name = self.memo_cache_name
+                try:
+                    meta_data, _, memo = \
+                        self._objects[self.formatted_cache_name]
+                except (KeyError, TypeError, ValueError):
+                    return
+                memo = dict(
+                    (format_string, dict(values))
+                    for format_string, values in memo.items()
+                )
+
+            make_dirs(self.cache_path)
+            try:
+                self._write(name, {name: (meta_data['cache_time'], memo)})
+            except:
+                traceback.print_exc()
+
+    def _load_memo(self, formatted_entries):
+        # adds the memoized values saved by _save_memo() to the formatted
+        # entries loaded from disk, if they belong to them
+        try:
+            meta_data, _, memo = formatted_entries
+            cache_time, saved_memo = self._read(self.memo_cache_name)
+        except (cache.CacheMiss, TypeError, ValueError):
+            return
+
+        if cache_time != meta_data['cache_time']:
+            return
+
         with self._write_lock:
-            self._objects[self.formatted_cache_name] = formatted_entries
+            for format_string, values in saved_memo.items():
+                memo.setdefault(format_string, {}).update(values)
+
+    def _get_formatter(self):
+        formatter = self._formatter_ref and self._formatter_ref()
+        if formatter is None:
+            meta_data, search_entries, memo = \
+                self._objects[self.formatted_cache_name]
+            formatter = _EntryFormatter(self, meta_data, search_entries, memo)
+            self._formatter_ref = weakref.ref(formatter)
+        return formatter
+
+    def _store_formatted_entries(self, bib_entries):
+        result = meta_data, search_entries, memo = \
+            self._create_formatted_entries(bib_entries)
+        # the index is created with the formatted entries and stored
+        # alongside them
+        index = bibindex.BibIndex.from_entries(
+            search_entries, meta_data['cache_time'])
+
+        with self._write_lock:
+            self._objects[self.formatted_cache_name] = result
+            self._objects[self.index_cache_name] = index
             self._dirty = True
+            self._dirty_keys.update(
+                (self.formatted_cache_name, self.index_cache_name))
         self._schedule_save()
 
-        return formatted_entries
+        # the entries are written to disk asynchronously, so keep them
+        # around until the first entry is formatted
+        self._pending_bib_entries = bib_entries
+        self._formatter_ref = None
+
+        return result
 
     def _create_formatted_entries(self, bib_entries):
-        # create the formatted entries
-        autocomplete_format = get_setting("cite_autocomplete_format")
-        panel_format = get_setting("cite_panel_format")
+        # create the entries used for searching; the formatted values are
+        # created lazily by the _EntryFormatter
+        autocomplete_format, panel_format = _get_formats()
 
         meta_data = frozendict(
             cache_time=long(time.time()),
@@ -154,17 +455,218 @@ class BibCache(cache.InstanceTrackingCache, cache.GlobalCache):
             panel_format=panel_format
         )
 
-        formatted_entries = tuple(
-            frozendict(**{
+        search_entries = bibtable.EntryTable(
+            {
                 "keyword": entry["keyword"],
                 "<prefix_match>": bibformat.create_prefix_match_str(entry),
-                "<panel_formatted>": tuple(
-                    bibformat.format_entry(s, entry) for s in panel_format
-                ),
-                "<autocomplete_formatted>":
-                    bibformat.format_entry(autocomplete_format, entry)
-            })
+                "<search_fields>": bibformat.create_search_fields(entry)
+            }
             for entry in bib_entries
         )
 
-        return meta_data, formatted_entries
+        return meta_data, search_entries, {}
+
+
+# invoked with the path of a bib file when get() returns outdated entries
+_refresh_handler = None
+_refresh_state = threading.local()
+
+
+def set_refresh_handler(handler):
+    '''
+    registers a function which is called with the path of a bib file when
+    BibCache.get() returns outdated entries for it; the function should
+    re-parse the bib file in the background, using refreshing(), or raise a
+    ValueError if it cannot do so, e.g. because it does not know the file
+
+    if handler is None, get() raises a CacheMiss instead, so that the bib
+    file is parsed immediately
+    '''
+    global _refresh_handler
+    _refresh_handler = handler
+
+
+@contextlib.contextmanager
+def refreshing():
+    '''
+    context manager for refreshing the bibliography; BibCache.get() never
+    returns outdated entries in this context in the current thread
+    '''
+    _refresh_state.active = True
+    try:
+        yield
+    finally:
+        _refresh_state.active = False
+
+
+def is_refreshing():
+    '''
+    returns whether the current thread is refreshing the bibliography
+    '''
+    return getattr(_refresh_state, 'active', False)
+
+
+# key of the global cache entry which maps the path of each bib file to its
+# modification time, size and content digest
+_CONTENT_DIGESTS_KEY = 'bib_content_digests'
+
+_content_digests = None
+_content_digests_lock = threading.Lock()
+
+
+def get_content_digest(bib_file):
+    '''
+    returns the md5 digest of the content of a bib file
+
+    the digest is only recomputed if the modification time or the size of
+    the file changed since it was last computed; the digests are persisted
+    in the global cache
+
+    raises an OSError or IOError if the file cannot be read
+    '''
+    global _content_digests
+
+    st = os.stat(bib_file)
+    stamp = (st.st_mtime, st.st_size)
+
+    with _content_digests_lock:
+        if _content_digests is None:
+            _content_digests = cache.read_global_dict(_CONTENT_DIGESTS_KEY)
+
+        try:
+            cached_stamp, digest = _content_digests[bib_file]
+        except KeyError:
+            pass
+        else:
+            if cached_stamp == stamp:
+                return digest
+
+    md5 = hashlib.md5()
+    with open(bib_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            md5.update(chunk)
+    digest = md5.hexdigest()
+
+    with _content_digests_lock:
+        _content_digests[bib_file] = (stamp, digest)
+        digests = dict(_content_digests)
+    cache.write_global(_CONTENT_DIGESTS_KEY, digests)
+
+    return digest
+
+
+def _get_cache_names(bib_plugin_name, digest):
+    # the names of the cache files for the entries, the formatted entries,
+    # the index and the memoized values of a bib file with the given content
+    # digest
+    return (
+        "bib_{0}_{1}".format(bib_plugin_name, digest),
+        "bib_{0}_fmt_{1}".format(bib_plugin_name, digest),
+        "bib_{0}_idx_{1}".format(bib_plugin_name, digest),
+        "bib_{0}_memo_{1}".format(bib_plugin_name, digest)
+    )
+
+
+def _get_formats():
+    autocomplete_format = get_setting("cite_autocomplete_format")
+    panel_format = get_setting("cite_panel_format")
+    if isinstance(panel_format, strbase):
+        panel_format = [panel_format]
+    return autocomplete_format, tuple(panel_format)
+
+
+class _EntryFormatter(object):
+    '''
+    formats the entries of a BibCache on demand
+
+    formatted values are stored in the memo of the cache, which maps each
+    format string to a dict of the formatted values by entry position
+    '''
+
+    def __init__(self, bib_cache, meta_data, search_entries, memo):
+        self._bib_cache = bib_cache
+        # the formatter may outlive a change of the bib file, see get()
+        self._cache_name = bib_cache.cache_name
+        self._lock = threading.Lock()
+        self._memo = memo
+        self._bib_entries = None
+        self.autocomplete_format = meta_data['autocomplete_format']
+        self.panel_format = meta_data['panel_format']
+        self._formats = set(self.panel_format)
+        self._formats.add(self.autocomplete_format)
+        self.search_entries = search_entries
+        self.entries = tuple(
+            FormattedEntry(self, i) for i in range(len(search_entries))
+        )
+
+    def format(self, format_string, pos):
+        try:
+            return self._memo[format_string][pos]
+        except KeyError:
+            pass
+
+        with self._lock:
+            bib_entries = self._bib_entries
+            if bib_entries is None:
+                bib_entries = self._bib_entries = \
+                    self._bib_cache._get_bib_entries(self._cache_name)
+        result = bibformat.format_entry(format_string, bib_entries[pos])
+
+        bib_cache = self._bib_cache
+        with bib_cache._write_lock:
+            self._memo.setdefault(format_string, {})[pos] = result
+            complete = all(
+                len(self._memo.get(s, ())) == len(self.search_entries)
+                for s in self._formats
+            )
+        bib_cache._schedule_memo_save()
+
+        # the bibliography entries are no longer needed once all entries
+        # are formatted
+        if complete:
+            with self._lock:
+                self._bib_entries = None
+
+        return result
+
+
+# marker for missing values
+_missing = object()
+
+
+class FormattedEntry(collections.Mapping):
+    '''
+    a formatted bibliography entry; "<panel_formatted>" and
+    "<autocomplete_formatted>" are created when first accessed
+    '''
+
+    __slots__ = ['_formatter', '_pos']
+
+    def __init__(self, formatter, pos):
+        self._formatter = formatter
+        self._pos = pos
+
+    def __getitem__(self, key):
+        formatter = self._formatter
+        if key == "<panel_formatted>":
+            return tuple(
+                formatter.format(s, self._pos)
+                for s in formatter.panel_format
+            )
+        elif key == "<autocomplete_formatted>":
+            return formatter.format(formatter.autocomplete_format, self._pos)
+        value = formatter.search_entries.get(self._pos, key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def _keys(self):
+        keys = self._formatter.search_entries.keys(self._pos)
+        keys.extend(("<panel_formatted>", "<autocomplete_formatted>"))
+        return keys
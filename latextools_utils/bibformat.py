@@ -4,10 +4,14 @@ import re
 
 
 TITLE_SEP = re.compile(':|\.|\?')
+TITLE_WORD = re.compile(r'\w+', re.UNICODE)
 PREFIX_MATCH_KEYS = set(["keyword", "title", "author"])
 
 formatter = Formatter()
 
+# compiled format strings by format string
+_compiled_formats = {}
+
 
 def _wrap(entry):
     if not isinstance(entry, CompletionWrapper):
@@ -15,13 +19,204 @@ def _wrap(entry):
     return entry
 
 
+def _unwrap(entry):
+    if isinstance(entry, CompletionWrapper):
+        entry = entry._entry
+    return entry
+
+
 def format_entry(format_string, entry):
-    return formatter.vformat(format_string, (), _wrap(entry))
+    return compile_format(format_string)(_unwrap(entry))
 
 
 def format_entries(format_string, entries):
-    return [formatter.vformat(format_string, (), _wrap(entry))
-            for entry in entries]
+    '''
+    formats all entries using the same format string; the format string is
+    only compiled once and the entries are not wrapped
+    '''
+    _format = compile_format(format_string)
+    return [_format(_unwrap(entry)) for entry in entries]
+
+
+def compile_format(format_string):
+    '''
+    compiles the format string into a callable which takes an entry and
+    returns the formatted entry
+
+    the result is the same as formatting a CompletionWrapper around the
+    entry, but the fallbacks for each field are resolved once, when the
+    format string is compiled
+    '''
+    try:
+        return _compiled_formats[format_string]
+    except KeyError:
+        pass
+
+    template = []
+    getters = []
+    simple = True
+    for literal, field_name, format_spec, conversion in \
+            formatter.parse(format_string):
+        template.append(literal.replace('%', '%%'))
+        if field_name is None:
+            continue
+
+        # positional fields, attribute and index access and nested format
+        # specs are left to the Formatter
+        if (
+            not field_name or field_name.isdigit() or
+            '.' in field_name or '[' in field_name or
+            '{' in (format_spec or '')
+        ):
+            simple = False
+            break
+
+        template.append('%s')
+        getters.append(
+            _format_field(_field_getter(field_name), format_spec, conversion)
+        )
+
+    if not simple:
+        def _format(entry):
+            return formatter.vformat(format_string, (), _wrap(entry))
+    else:
+        template = ''.join(template)
+        getters = tuple(getters)
+
+        def _format(entry):
+            return template % tuple([g(entry) for g in getters])
+
+    _compiled_formats[format_string] = _format
+    return _format
+
+
+def _format_field(getter, format_spec, conversion):
+    if not format_spec and not conversion:
+        return getter
+
+    def _get(entry):
+        value = formatter.convert_field(getter(entry), conversion)
+        return formatter.format_field(value, format_spec)
+    return _get
+
+
+def _field_getter(key):
+    '''
+    returns a function to get the value for key from an entry, applying the
+    same fallbacks as CompletionWrapper
+    '''
+    if key[0] == '<':
+        def _get(entry):
+            return entry[key]
+        return _get
+
+    fallbacks = _FALLBACKS.get(key)
+
+    if key in ('author', 'journal'):
+        def _get(entry):
+            try:
+                return entry[key] or u'????'
+            except KeyError:
+                return fallbacks(entry)
+    elif fallbacks is not None:
+        def _get(entry):
+            try:
+                return entry[key]
+            except KeyError:
+                return fallbacks(entry)
+    else:
+        def _get(entry):
+            try:
+                return entry[key]
+            except KeyError:
+                return u'????'
+
+    return _get
+
+
+def _fallback_keyword(entry):
+    try:
+        return entry['citekey']
+    except KeyError:
+        return u'????'
+
+
+def _fallback_author(entry):
+    try:
+        return entry['editor']
+    except KeyError:
+        return u'????'
+
+
+def _fallback_author_short(entry):
+    try:
+        return get_author_short(entry['author'])
+    except KeyError:
+        pass
+
+    try:
+        return entry['editor_short']
+    except KeyError:
+        return _fallback_editor_short(entry)
+
+
+def _fallback_editor_short(entry):
+    try:
+        return get_author_short(entry['editor'])
+    except KeyError:
+        return u'????'
+
+
+def _fallback_title_short(entry):
+    try:
+        return entry['shorttitle']
+    except KeyError:
+        pass
+
+    try:
+        return get_title_short(entry['title'])
+    except KeyError:
+        return u'????'
+
+
+def _fallback_journal(entry):
+    try:
+        return entry['journaltitle']
+    except KeyError:
+        pass
+
+    try:
+        return entry['eprint']
+    except KeyError:
+        return u'????'
+
+
+_YEAR_RE = re.compile(r'(\d{4})')
+_MONTH_RE = re.compile(r'\d{4}-(\d{2})')
+
+
+def _date_fallback(date_re):
+    def _fallback(entry):
+        try:
+            date_matcher = date_re.match(entry['date'])
+            if date_matcher:
+                return date_matcher.group(1)
+        except KeyError:
+            pass
+        return u'????'
+    return _fallback
+
+
+_FALLBACKS = {
+    'keyword': _fallback_keyword,
+    'author': _fallback_author,
+    'author_short': _fallback_author_short,
+    'editor_short': _fallback_editor_short,
+    'title_short': _fallback_title_short,
+    'journal': _fallback_journal,
+    'year': _date_fallback(_YEAR_RE),
+    'month': _date_fallback(_MONTH_RE)
+}
 
 
 def create_prefix_match_str(entry):
@@ -30,6 +225,26 @@ def create_prefix_match_str(entry):
     return prefix_str
 
 
+def create_search_fields(entry):
+    '''
+    creates the lower case fields used to rank the entry for a search, i.e.
+    a tuple of the keyword, the last names of the authors, the year and the
+    words of the title
+    '''
+    entry = _wrap(entry)
+
+    def _get(key):
+        value = entry[key]
+        return u'' if value == u'????' else value.lower()
+
+    return (
+        _get('keyword'),
+        tuple(get_author_last_names(_get('author'))),
+        _get('year'),
+        tuple(TITLE_WORD.findall(_get('title')))
+    )
+
+
 def get_title_short(title):
     title = TITLE_SEP.split(title)[0]
     if len(title) > 60:
@@ -44,12 +259,7 @@ def get_author_short(authors):
     if authors == '':
         return ''
 
-    # split authors using ' and ' and get last name for 'last, first' format
-    authors = [a.split(", ")[0].strip(' ') for a in authors.split(" and ")]
-    # get last name for 'first last' format (preserve {...} text)
-    authors = [a.split(" ")[-1] if not('{' in a and a.endswith('}'))
-               else re.sub(r'{|}', '', a[a.rindex('{') + 1:-1])
-               for a in authors if len(a) > 0]
+    authors = get_author_last_names(authors)
 
     # truncate and add 'et al.'
     if len(authors) > 2:
@@ -61,6 +271,18 @@ def get_author_short(authors):
     return authors
 
 
+def get_author_last_names(authors):
+    if authors == '':
+        return []
+
+    # split authors using ' and ' and get last name for 'last, first' format
+    authors = [a.split(", ")[0].strip(' ') for a in authors.split(" and ")]
+    # get last name for 'first last' format (preserve {...} text)
+    return [a.split(" ")[-1] if not('{' in a and a.endswith('}'))
+            else re.sub(r'{|}', '', a[a.rindex('{') + 1:-1])
+            for a in authors if len(a) > 0]
+
+
 class CompletionWrapper(collections.Mapping):
     '''
     Wraps the returned completions so that we can properly handle any
@@ -0,0 +1,273 @@
+'''
+an n-gram inverted index over the "<prefix_match>" strings of formatted
+bibliography entries
+
+the index maps every trigram occurring in the prefix match string of an
+entry to the sorted list of positions of the entries containing it; a
+substring query is answered by intersecting the posting lists of all
+trigrams of the query and verifying the (few) remaining candidates, so
+we never scan the whole bibliography on each keystroke
+'''
+from array import array
+import heapq
+
+import sublime
+
+if sublime.version() < '3000':
+    from latextools_utils import bibformat
+else:
+    from . import bibformat
+
+# length of the n-grams stored in the index; queries (or query words)
+# shorter than this cannot be answered from the index
+NGRAM_LENGTH = 3
+
+
+def _ngrams(s, n=NGRAM_LENGTH):
+    return set(s[i:i + n] for i in range(len(s) - n + 1))
+
+
+class BibIndex(object):
+    '''
+    an inverted trigram index over a sequence of formatted entries
+
+    the index is picklable, so it can be persisted alongside the formatted
+    entries it was created for; `cache_time` identifies the formatted
+    entries the index belongs to
+    '''
+
+    def __init__(self, prefix_strs, cache_time=None):
+        self.cache_time = cache_time
+        self.prefix_strs = tuple(prefix_strs)
+
+        postings = {}
+        for i, s in enumerate(self.prefix_strs):
+            for gram in _ngrams(s):
+                try:
+                    postings[gram].append(i)
+                except KeyError:
+                    postings[gram] = array('i', (i,))
+        self.postings = postings
+
+    @classmethod
+    def from_entries(cls, entries, cache_time=None):
+        return cls(
+            (_get_prefix_match_str(entry) for entry in entries),
+            cache_time
+        )
+
+    def __len__(self):
+        return len(self.prefix_strs)
+
+    def search(self, query):
+        '''
+        returns the sorted list of positions of all entries which contain
+        every whitespace separated word of `query` as a substring
+
+        `query` is expected to be lower case, like the prefix match strings
+        '''
+        words = query.split()
+        if not words:
+            return list(range(len(self.prefix_strs)))
+
+        candidates = None
+        postings = self.postings
+        for word in words:
+            grams = _ngrams(word)
+            if not grams:
+                continue
+
+            # intersect starting with the shortest posting list
+            lists = []
+            for gram in grams:
+                try:
+                    lists.append(postings[gram])
+                except KeyError:
+                    return []
+            lists.sort(key=len)
+
+            for posting in lists:
+                if candidates is None:
+                    candidates = set(posting)
+                else:
+                    candidates.intersection_update(posting)
+                if not candidates:
+                    return []
+
+        prefix_strs = self.prefix_strs
+        if candidates is None:
+            # only short words, which cannot be resolved using the index
+            candidates = range(len(prefix_strs))
+        else:
+            candidates = sorted(candidates)
+
+        if len(words) == 1:
+            word = words[0]
+            return [i for i in candidates if word in prefix_strs[i]]
+
+        return [
+            i for i in candidates
+            if all(word in prefix_strs[i] for word in words)
+        ]
+
+
+class EntryList(list):
+    '''
+    a list of bibliography entries which remembers the index of each of
+    the bib files it was assembled from
+
+    this allows the cite completions to filter the entries using the
+    index of each file and to fall back to a linear scan only for those
+    entries without an index, e.g. if the bibliography could not be cached
+    '''
+
+    def __init__(self, *args):
+        super(EntryList, self).__init__(*args)
+        self._segments = []
+
+    def extend(self, entries, index=None):
+        start = len(self)
+        super(EntryList, self).extend(entries)
+        if index is not None and len(index) != len(self) - start:
+            index = None
+        self._segments.append((start, len(self), index))
+
+    def search(self, query):
+        '''
+        returns all entries whose prefix match string contains every word
+        of the (lower case) query
+        '''
+        result = []
+        covered = 0
+        for start, end, index in self._segments:
+            # entries added using append(), etc.
+            if covered < start:
+                result.extend(_scan(self[covered:start], query))
+            if index is None:
+                result.extend(_scan(self[start:end], query))
+            else:
+                result.extend(self[start + i] for i in index.search(query))
+            covered = end
+
+        if covered < len(self):
+            result.extend(_scan(self[covered:], query))
+
+        return result
+
+
+# scores for a query word matching (exactly, as a prefix, as a substring)
+# a word of the respective field
+_KEYWORD_SCORES = (100, 80, 40)
+_AUTHOR_SCORES = (60, 45, 20)
+_YEAR_SCORES = (50, 30, 0)
+_TITLE_SCORES = (30, 20, 8)
+
+
+def _match_score(word, value, scores):
+    if word == value:
+        return scores[0]
+    elif value.startswith(word):
+        return scores[1]
+    elif word in value:
+        return scores[2]
+    return 0
+
+
+def _score_word(word, fields):
+    keyword, authors, year, title_words = fields
+
+    score = _match_score(word, keyword, _KEYWORD_SCORES)
+    if score:
+        # the earlier the match in the keyword, the better
+        score -= min(keyword.index(word), 20)
+
+    # earlier authors are weighted higher than later ones
+    for i, author in enumerate(authors):
+        score = max(
+            score, _match_score(word, author, _AUTHOR_SCORES) // (i + 1))
+
+    if year:
+        score = max(score, _match_score(word, year, _YEAR_SCORES))
+
+    # as are earlier words of the title
+    for i, title_word in enumerate(title_words):
+        title_score = _match_score(word, title_word, _TITLE_SCORES)
+        if title_score:
+            score = max(score, title_score - min(i, 10))
+
+    return score
+
+
+def score_entry(words, entry):
+    '''
+    scores the entry for the lower case query `words`; returns None if
+    the entry does not match every word of the query
+    '''
+    try:
+        fields = entry["<search_fields>"]
+    except:
+        fields = bibformat.create_search_fields(entry)
+
+    prefix_str = None
+    total = 0
+    for word in words:
+        score = _score_word(word, fields)
+        if not score:
+            if prefix_str is None:
+                prefix_str = _get_prefix_match_str(entry)
+            if word not in prefix_str:
+                return None
+            score = 1
+        total += score
+    return total
+
+
+def rank(entries, query, limit=None):
+    '''
+    returns the entries matching every word of the (lower case) query
+    ordered by their score; entries with the same score retain their
+    order
+
+    if limit is specified, only the best `limit` entries are returned,
+    which are selected using a bounded heap
+    '''
+    words = query.split()
+    if not words:
+        return list(entries[:limit] if limit else entries)
+
+    # use the index to select the candidates; numbers can also match the
+    # year, which is not part of the prefix match string
+    text_query = u' '.join(w for w in words if not w.isdigit())
+    if text_query:
+        if hasattr(entries, 'search'):
+            entries = entries.search(text_query)
+        else:
+            entries = _scan(entries, text_query)
+
+    scored = []
+    for i, entry in enumerate(entries):
+        score = score_entry(words, entry)
+        if score is not None:
+            scored.append((score, -i, entry))
+
+    if limit:
+        scored = heapq.nlargest(limit, scored, key=lambda s: s[:2])
+    else:
+        scored.sort(key=lambda s: s[:2], reverse=True)
+
+    return [s[2] for s in scored]
+
+
+def _get_prefix_match_str(entry):
+    try:
+        return entry["<prefix_match>"]
+    except:
+        return bibformat.create_prefix_match_str(entry)
+
+
+def _scan(entries, query):
+    words = query.split() or ['']
+    return [
+        entry for entry in entries
+        if all(word in _get_prefix_match_str(entry) for word in words)
+    ]
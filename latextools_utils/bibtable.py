@@ -0,0 +1,208 @@
+'''
+a compact, columnar storage for bibliography entries
+
+an EntryTable stores each distinct field name and each distinct value only
+once; each entry is a row of (field, value) references into these tables,
+which are kept in a single array of integers; this makes the pickled table
+considerably smaller than the equivalent list of dicts, in which keys and
+common values, e.g. journal names, are repeated for every entry, and much
+faster to unpickle
+
+the entries of a table are accessed as lightweight read-only views, which
+are only created when an entry is accessed
+'''
+from array import array
+import collections
+
+
+class EntryTable(object):
+    '''
+    a read-only sequence of bibliography entries stored in columnar form
+
+    the values must be hashable; if a wrapper class is given, each view is
+    wrapped in it when accessed, e.g. to decode the values of the raw
+    fields stored in the table; the wrapper must be picklable
+    '''
+
+    def __init__(self, rows, wrapper=None):
+        fields = []
+        field_index = {}
+        values = []
+        value_index = {}
+        interned = {}
+        cells = array('i')
+        offsets = array('i', (0,))
+
+        for row in rows:
+            for field, value in row.items():
+                try:
+                    f = field_index[field]
+                except KeyError:
+                    f = field_index[field] = len(fields)
+                    fields.append(field)
+
+                try:
+                    v = value_index[value]
+                except KeyError:
+                    v = value_index[value] = len(values)
+                    if isinstance(value, tuple):
+                        # share equal items of tuples, e.g. the author
+                        # names, so they are only pickled once
+                        value = _intern_items(value, interned)
+                    values.append(value)
+
+                cells.append(f)
+                cells.append(v)
+            offsets.append(len(cells))
+
+        self.fields = tuple(fields)
+        self.values = tuple(values)
+        self.cells = cells
+        self.offsets = offsets
+        self.wrapper = wrapper
+        self._field_index = field_index
+
+    @classmethod
+    def from_entries(cls, entries):
+        '''
+        creates a table from a list of bibliography entries or returns None
+        if they cannot be stored in a table
+
+        entries can either be mappings with hashable values or all be
+        objects of the same class implementing a table_row() method; this
+        method must return the mapping of the raw fields to store and the
+        class must accept a view of this mapping as its only argument
+        '''
+        wrapper = None
+        rows = []
+        try:
+            for entry in entries:
+                if hasattr(entry, 'table_row'):
+                    if wrapper is None:
+                        wrapper = entry.__class__
+                    elif wrapper is not entry.__class__:
+                        return None
+                    rows.append(entry.table_row())
+                elif (
+                    wrapper is None and
+                    isinstance(entry, collections.Mapping)
+                ):
+                    rows.append(entry)
+                else:
+                    return None
+
+            return cls(rows, wrapper)
+        except TypeError:
+            # unhashable values
+            return None
+
+    def get(self, pos, key, default=None):
+        '''
+        returns the value of the field key of the entry at position pos
+        '''
+        try:
+            f = self._field_index[key]
+        except KeyError:
+            return default
+
+        cells = self.cells
+        for i in range(self.offsets[pos], self.offsets[pos + 1], 2):
+            if cells[i] == f:
+                return self.values[cells[i + 1]]
+        return default
+
+    def keys(self, pos):
+        '''
+        returns the field names of the entry at position pos
+        '''
+        fields = self.fields
+        cells = self.cells
+        return [
+            fields[cells[i]]
+            for i in range(self.offsets[pos], self.offsets[pos + 1], 2)
+        ]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError('entry index out of range')
+
+        view = EntryView(self, pos)
+        if self.wrapper is not None:
+            return self.wrapper(view)
+        return view
+
+    def __iter__(self):
+        for pos in range(len(self)):
+            yield self[pos]
+
+    def rows(self):
+        '''
+        iterates over the views of the entries without wrapping them, i.e.,
+        over the raw fields stored in the table
+        '''
+        for pos in range(len(self)):
+            yield EntryView(self, pos)
+
+    def __getstate__(self):
+        return (self.fields, self.values, self.cells, self.offsets,
+                self.wrapper)
+
+    def __setstate__(self, state):
+        self.fields, self.values, self.cells, self.offsets, self.wrapper = \
+            state
+        self._field_index = dict(
+            (field, f) for f, field in enumerate(self.fields))
+
+
+def _intern_items(value, interned):
+    items = []
+    for item in value:
+        if isinstance(item, tuple):
+            item = _intern_items(item, interned)
+        items.append(interned.setdefault(item, item))
+    return tuple(items)
+
+
+# marker for missing values
+_missing = object()
+
+
+class EntryView(collections.Mapping):
+    '''
+    a read-only view of an entry of an EntryTable
+    '''
+
+    __slots__ = ['_table', '_pos']
+
+    def __init__(self, table, pos):
+        self._table = table
+        self._pos = pos
+
+    @property
+    def cite_key(self):
+        return self._table.get(self._pos, 'keyword')
+
+    def get(self, key, default=None):
+        return self._table.get(self._pos, key, default)
+
+    def __getitem__(self, key):
+        value = self._table.get(self._pos, key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._table.get(self._pos, key, _missing) is not _missing
+
+    def __iter__(self):
+        return iter(self._table.keys(self._pos))
+
+    def __len__(self):
+        pos = self._pos
+        offsets = self._table.offsets
+        return (offsets[pos + 1] - offsets[pos]) // 2
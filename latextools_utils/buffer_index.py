@@ -0,0 +1,261 @@
+'''
+incrementally updated indexes of the content of bib buffers
+
+the completions in bib buffers need to know about all entries in the
+buffer, but re-scanning a large buffer on each keystroke is slow; instead,
+the buffer is split into chunks at each "@", i.e., roughly one chunk per
+entry, and the result of scanning each chunk is kept; when the buffer is
+modified, only the chunks whose text changed are scanned again
+
+Sublime Text does not report the modified regions of a buffer to the event
+listeners, so the region typed into is derived from the selection in
+on_modified (see note_modification()); only the chunks around it are read
+again. For other modifications, e.g. pasting or undoing, the whole buffer is
+split again and the changed chunks are detected by their text
+'''
+from bisect import bisect_right
+
+import sublime
+
+
+class BufferIndex(object):
+    '''
+    the results of scanning each chunk of a buffer
+
+    scan_chunk is called with the text of each chunk, which does not
+    include the leading "@", and must return the result to store for it;
+    results is the list of results for all chunks in document order; note
+    that the first chunk is the text before the first "@"
+    '''
+
+    def __init__(self, scan_chunk, separator=u'@'):
+        self.scan_chunk = scan_chunk
+        self.separator = separator
+        self.change_count = None
+        self.size = None
+        self.results = []
+        # the text and the start of each chunk
+        self._texts = []
+        self._starts = []
+        # values derived from the results, see derive()
+        self._derived = {}
+
+    def update(self, view):
+        '''
+        updates the index from the current content of the view; returns
+        True if the content changed since the last update
+        '''
+        change_count = view.change_count()
+        if change_count == self.change_count:
+            return False
+
+        modified = _get_modified_region(view, self.change_count, self.size)
+        if modified is None or not self._update_region(view, *modified):
+            self._update_all(view)
+
+        self._derived = {}
+        self.change_count = change_count
+        self.size = view.size()
+        return True
+
+    def _update_all(self, view):
+        old_results = dict(zip(self._texts, self.results))
+        texts = view.substr(
+            sublime.Region(0, view.size())).split(self.separator)
+
+        results = []
+        for text in texts:
+            try:
+                result = old_results[text]
+            except KeyError:
+                result = old_results[text] = self.scan_chunk(text)
+            results.append(result)
+
+        self._texts = texts
+        self._starts = self._get_starts(texts, 0)
+        self.results = results
+
+    def _update_region(self, view, begin, end, delta):
+        # re-reads the chunks around the region between begin and end,
+        # which is given in the current coordinates of the buffer, and was
+        # the only part modified; the buffer grew by delta characters
+        starts = self._starts
+        texts = self._texts
+        if not starts:
+            return False
+
+        # the first chunk starting before the region and the chunk after the
+        # end of the region in the previous content of the buffer
+        first = max(bisect_right(starts, max(begin - 1, 0)) - 1, 0)
+        last = max(bisect_right(starts, end - delta + 1) - 1, first)
+
+        region_begin = starts[first]
+        region_end = starts[last] + len(texts[last]) + delta
+        if region_end < region_begin or region_end > view.size():
+            return False
+
+        new_texts = view.substr(
+            sublime.Region(region_begin, region_end)).split(self.separator)
+
+        old_results = dict(
+            zip(texts[first:last + 1], self.results[first:last + 1]))
+        new_results = []
+        for text in new_texts:
+            try:
+                result = old_results[text]
+            except KeyError:
+                result = old_results[text] = self.scan_chunk(text)
+            new_results.append(result)
+
+        texts[first:last + 1] = new_texts
+        self.results[first:last + 1] = new_results
+        starts[first:last + 1] = self._get_starts(new_texts, region_begin)
+        if delta:
+            for i in range(first + len(new_texts), len(starts)):
+                starts[i] += delta
+
+        return True
+
+    def _get_starts(self, texts, start):
+        starts = []
+        for text in texts:
+            starts.append(start)
+            start += len(text) + len(self.separator)
+        return starts
+
+    def derive(self, name, func):
+        '''
+        returns func(results), which is memoized under name until the
+        content of the buffer changes
+        '''
+        try:
+            return self._derived[name]
+        except KeyError:
+            value = self._derived[name] = func(self.results)
+            return value
+
+
+# (view id, name) -> BufferIndex
+_INDEXES = {}
+
+# view id -> [change count, list of (change count, size, modified region)]
+# the modifications of the views with an index since the change count
+_MODIFICATIONS = {}
+
+# the maximum number of modifications recorded for a view
+_MAX_MODIFICATIONS = 1000
+
+# the commands whose modifications are made at the selection; anything else
+# causes the whole buffer to be read again
+_TYPING_COMMANDS = set(['insert', 'left_delete', 'right_delete'])
+
+
+def get_buffer_index(view, name, scan_chunk):
+    '''
+    returns the up-to-date index called name of the view, creating it with
+    the scan_chunk function if necessary
+    '''
+    key = (view.id(), name)
+    try:
+        index = _INDEXES[key]
+    except KeyError:
+        index = _INDEXES[key] = BufferIndex(scan_chunk)
+        if view.id() not in _MODIFICATIONS:
+            _MODIFICATIONS[view.id()] = [view.change_count(), []]
+
+    index.update(view)
+    return index
+
+
+def note_modification(view):
+    '''
+    records the region of the view modified by the last change, so that its
+    indexes can be updated without reading the whole buffer; this must be
+    called from the on_modified event of the view
+    '''
+    try:
+        log = _MODIFICATIONS[view.id()]
+    except KeyError:
+        return
+
+    change_count = view.change_count()
+    modifications = log[1]
+    if modifications and modifications[-1][0] == change_count:
+        return
+
+    modifications.append(
+        (change_count, view.size(), _get_typed_region(view)))
+    if len(modifications) > _MAX_MODIFICATIONS:
+        log[0] = modifications.pop(0)[0]
+
+
+def drop_buffer_indexes(view):
+    '''
+    drops all indexes of the view, e.g. when it is closed
+    '''
+    view_id = view.id()
+    for key in list(_INDEXES.keys()):
+        if key[0] == view_id:
+            del _INDEXES[key]
+    _MODIFICATIONS.pop(view_id, None)
+
+
+def _get_typed_region(view):
+    # the region which may have been modified by typing at the selection or
+    # None if the last command is not a typing command
+    try:
+        command, args, _ = view.command_history(0, True)
+    except:
+        return None
+
+    if command not in _TYPING_COMMANDS:
+        return None
+
+    length = len((args or {}).get('characters', u''))
+    begin = view.size()
+    end = 0
+    for region in view.sel():
+        # the inserted characters may be indented or follow a newline, so
+        # the region starts on the line before
+        line_begin = view.line(max(region.begin() - length, 0)).begin()
+        begin = min(begin, view.line(max(line_begin - 1, 0)).begin())
+        end = max(end, region.end() + 1)
+
+    if begin > end:
+        return None
+    return begin, min(end, view.size())
+
+
+def _get_modified_region(view, change_count, size):
+    # the region of the view modified since change_count, when it had the
+    # given size, and the number of characters added; None if unknown
+    try:
+        base_change_count, modifications = _MODIFICATIONS[view.id()]
+    except KeyError:
+        return None
+
+    if change_count is None or change_count < base_change_count:
+        return None
+
+    modifications = [m for m in modifications if m[0] > change_count]
+    if not modifications or modifications[-1][0] != view.change_count():
+        return None
+
+    begin = end = None
+    new_size = size
+    for _, modified_size, region in modifications:
+        if region is None:
+            return None
+
+        delta = modified_size - new_size
+        new_size = modified_size
+        if begin is None:
+            begin, end = region
+        else:
+            # move the region modified before to the new coordinates
+            if end >= region[0]:
+                end += delta
+            begin = min(begin, region[0])
+            end = max(end, region[1])
+
+    return begin, end, new_size - size
@@ -1,4 +1,8 @@
 import collections
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 import copy
 import hashlib
 import os
@@ -176,6 +180,38 @@ def read_global(key):
     return GlobalCache().get(key)
 
 
+def read_global_dict(key):
+    '''
+    returns the dict stored in the GlobalCache under key or an empty dict if
+    there is none
+
+    the cache stores dicts as (immutable) frozendicts, so the value and the
+    dicts nested in it are copied into dicts which can be updated
+
+    :param key:
+        the key the dict is stored under
+    '''
+    try:
+        value = read_global(key)
+    except CacheMiss:
+        return {}
+    except:
+        traceback.print_exc()
+        return {}
+
+    if not isinstance(value, Mapping):
+        return {}
+    return _thaw(value)
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return dict((k, _thaw(v)) for k, v in value.items())
+    elif isinstance(value, tuple):
+        return tuple(_thaw(v) for v in value)
+    return value
+
+
 # aliases
 cache = cache_local
 write = write_local
@@ -224,6 +260,10 @@ class Cache(object):
             self._objects = {}
         if not hasattr(self, '_dirty'):
             self._dirty = False
+        # the keys of the entries changed since the last save; if the cache
+        # is dirty but no keys are recorded, all entries are saved
+        if not hasattr(self, '_dirty_keys'):
+            self._dirty_keys = set()
         if not hasattr(self, '_save_queue'):
             self._save_queue = []
         if not hasattr(self, '_pool'):
@@ -304,6 +344,7 @@ class Cache(object):
         with self._write_lock:
             self._objects[key] = obj
             self._dirty = True
+            self._dirty_keys.add(key)
         self._schedule_save()
 
     def cache(self, key, func):
@@ -406,8 +447,8 @@ class Cache(object):
         saves the cache entry specified to disk
 
         :param key:
-            the entry to flush to disk; if None, all entries in the cache will
-            be written to disk
+            the entry to flush to disk; if None, all changed entries in the
+            cache will be written to disk
         '''
         if not self._dirty:
             return
@@ -415,12 +456,40 @@ class Cache(object):
         # lock is aquired here so that all keys being flushed reflect the
         # same state; note that this blocks disk reads, but not cache reads
         with self._disk_lock:
-            # operate on a stable copy of the object
+            # operate on a stable copy of the entries to write; only the
+            # entries which changed are copied, if they are known
             with self._write_lock:
-                _objs = copy.deepcopy(self._objects)
-                self._dirty = False
+                if key is not None:
+                    keys = [key]
+                    self._dirty_keys.discard(key)
+                    self._dirty = bool(self._dirty_keys)
+                elif self._dirty_keys:
+                    keys = self._dirty_keys
+                    self._dirty_keys = set()
+                    self._dirty = False
+                else:
+                    keys = None
+                    self._dirty = False
 
-            if key is None:
+                if keys is None:
+                    _objs = copy.deepcopy(self._objects)
+                else:
+                    _objs = copy.deepcopy(dict(
+                        (k, self._objects[k])
+                        for k in keys if k in self._objects
+                    ))
+
+            if keys is not None and key is None:
+                # only write the changed entries which are still valid
+                make_dirs(self.cache_path)
+                for k in _objs.keys():
+                    if _objs[k] is _invalid_object:
+                        continue
+                    try:
+                        self._write(k, _objs)
+                    except:
+                        traceback.print_exc()
+            elif key is None:
                 # remove all InvalidObjects
                 delete_keys = [
                     k for k in _objs if _objs[k] is _invalid_object
@@ -1,6 +1,8 @@
 import sublime
+from bisect import bisect_left
 import codecs
 import itertools
+import re
 import sys
 import threading
 import time
@@ -28,6 +30,32 @@ else:
     from .six import reraise
 
 
+def fuzzy_search_sorted(keys, prefix):
+    '''
+    returns the positions of the keys which match prefix similar to the
+    fuzzy matching of completions by Sublime Text: a key matches if it
+    starts with the first character of prefix and contains the others in
+    the same order; the keys must be sorted, and they and prefix lowercase
+
+    since the first character must match, the candidates are found using
+    binary search
+    '''
+    if not prefix:
+        return list(range(len(keys)))
+
+    first = prefix[0]
+    start = end = bisect_left(keys, first)
+    while end < len(keys) and keys[end].startswith(first):
+        end += 1
+
+    if len(prefix) == 1:
+        return list(range(start, end))
+
+    matcher = re.compile(
+        u'.*?'.join(re.escape(c) for c in prefix[1:]), re.DOTALL)
+    return [i for i in range(start, end) if matcher.search(keys[i], 1)]
+
+
 def run_after_loading(view, func):
     """Run a function after the view has finished loading"""
     def run():
@@ -58,6 +58,7 @@ import sys
 import os
 import signal
 import threading
+import time
 import functools
 import subprocess
 import types
@@ -258,6 +259,27 @@ class CmdThread ( threading.Thread ):
 		print ("Welcome to thread " + self.getName())
 		self.caller.output("[Compiling " + self.caller.file_name + "]")
 
+		# Parse the log while TeX writes it, so errors are shown right away
+		self.log_watcher = None
+		if self.caller.parse_log_during_build:
+			self.log_watcher = LogWatcher(
+				self.get_log_file_candidates(),
+				self.caller.tex_dir,
+				self.caller.on_log_update
+			)
+			self.log_watcher.start()
+
+		try:
+			self.run_commands()
+		finally:
+			self.stop_log_watcher()
+
+	def stop_log_watcher(self):
+		if self.log_watcher is not None:
+			self.log_watcher.stop()
+			self.log_watcher = None
+
+	def run_commands(self):
 		env = dict(os.environ)
 		if self.caller.path:
 			env['PATH'] = self.caller.path
@@ -325,6 +347,9 @@ class CmdThread ( threading.Thread ):
 					if not self.caller.proc:
 						print (proc.returncode)
 						self.caller.output("\n\n[User terminated compilation process]\n")
+						# the log is not parsed, so keep the errors shown while building
+						if _HAS_PHANTOMS:
+							self.caller.errors = list(self.caller.live_errors)
 						self.caller.finish(False)	# We kill, so won't switch to PDF anyway
 						return
 				# Here we are done cleanly:
@@ -344,51 +369,11 @@ class CmdThread ( threading.Thread ):
 
 		# Clean up
 		cmd_iterator.close()
+		# The log is complete now, so we parse all of it below
+		self.stop_log_watcher()
 
 		try:
-			# Here we try to find the log file...
-			# 1. Check the aux_directory if there is one
-			# 2. Check the output_directory if there is one
-			# 3. Assume the log file is in the same folder as the main file
-			log_file_base = self.caller.tex_base + ".log"
-			if self.caller.aux_directory is None:
-				if self.caller.output_directory is None:
-					log_file = os.path.join(
-						self.caller.tex_dir,
-						log_file_base
-					)
-				else:
-					log_file = os.path.join(
-						self.caller.output_directory,
-						log_file_base
-					)
-
-					if not os.path.exists(log_file):
-						log_file = os.path.join(
-							self.caller.tex_dir,
-							log_file_base
-						)
-			else:
-				log_file = os.path.join(
-					self.caller.aux_directory,
-					log_file_base
-				)
-
-				if not os.path.exists(log_file):
-					if (
-						self.caller.output_directory is not None and
-						self.caller.output_directory != self.caller.aux_directory
-					):
-						log_file = os.path.join(
-							self.caller.output_directory,
-							log_file_base
-						)
-
-					if not os.path.exists(log_file):
-						log_file = os.path.join(
-							self.caller.tex_dir,
-							log_file_base
-						)
+			log_file = self.get_log_file()
 
 			# CHANGED 12-10-27. OK, here's the deal. We must open in binary mode
 			# on Windows because silly MiKTeX inserts ASCII control characters in
@@ -428,8 +413,17 @@ class CmdThread ( threading.Thread ):
 			badboxes = []
 
 			try:
+				# use the recorder file of the run, if any, to identify the
+				# files in the log
+				recorded_files = None
+				if self.caller.use_recorder_file:
+					recorded_files = parseTeXlog.read_fls_file(
+						os.path.splitext(log_file)[0] + '.fls',
+						self.caller.tex_dir, log_file
+					)
+
 				(errors, warnings, badboxes) = parseTeXlog.parse_tex_log(
-					data, self.caller.tex_dir
+					data, self.caller.tex_dir, recorded_files
 				)
 				content = [""]
 				if errors:
@@ -530,6 +524,128 @@ class CmdThread ( threading.Thread ):
 
 			self.caller.finish(len(errors) == 0)
 
+	# Here we try to find the log file...
+	# 1. Check the aux_directory if there is one
+	# 2. Check the output_directory if there is one
+	# 3. Assume the log file is in the same folder as the main file
+	def get_log_file_candidates(self):
+		log_file_base = self.caller.tex_base + ".log"
+		candidates = []
+		for directory in (
+			self.caller.aux_directory,
+			self.caller.output_directory,
+			self.caller.tex_dir
+		):
+			if directory is None:
+				continue
+			log_file = os.path.join(directory, log_file_base)
+			if log_file not in candidates:
+				candidates.append(log_file)
+		return candidates
+
+	def get_log_file(self):
+		candidates = self.get_log_file_candidates()
+		for log_file in candidates[:-1]:
+			if os.path.exists(log_file):
+				return log_file
+		return candidates[-1]
+
+
+# Tails the log file while the build is running and parses it incrementally,
+# calling on_update with the errors, warnings and bad boxes found so far
+# whenever there are new ones.
+#
+# Each TeX run rewrites the log, so we start over whenever the log shrinks or
+# the data we have already read changes. Only a log written after the build
+# started is considered, as there may still be one from a previous build.
+class LogWatcher(threading.Thread):
+
+	# seconds between checks of the log file
+	POLL_INTERVAL = 0.5
+	# number of bytes before the current position compared to detect that
+	# the log has been rewritten
+	TAIL_SIZE = 256
+
+	def __init__(self, log_files, root_dir, on_update):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.log_files = log_files
+		self.root_dir = root_dir
+		self.on_update = on_update
+		# allow for file systems with a coarse mtime resolution
+		self.start_time = time.time() - 2
+		self.log_file = None
+		self._stopped = threading.Event()
+		self._restart()
+
+	def stop(self):
+		self._stopped.set()
+		self.join()
+
+	def run(self):
+		while not self._stopped.is_set():
+			try:
+				self._poll()
+			except:
+				# the log is parsed again once the build is done, so just
+				# stop watching
+				traceback.print_exc()
+				return
+			self._stopped.wait(self.POLL_INTERVAL)
+
+	def _restart(self):
+		self.parser = parseTeXlog.TeXLogParser(self.root_dir)
+		self.offset = 0
+		self.tail = b""
+		self.counts = (0, 0, 0)
+
+	def _find_log_file(self):
+		for log_file in self.log_files:
+			try:
+				if os.path.getmtime(log_file) >= self.start_time:
+					return log_file
+			except OSError:
+				pass
+		return None
+
+	def _poll(self):
+		if self.log_file is None:
+			self.log_file = self._find_log_file()
+			if self.log_file is None:
+				return
+
+		try:
+			with open(self.log_file, 'rb') as f:
+				size = os.fstat(f.fileno()).st_size
+				if size < self.offset or not self._same_tail(f):
+					self._restart()
+				if size == self.offset:
+					return
+				f.seek(self.offset)
+				data = f.read(size - self.offset)
+		except (IOError, OSError):
+			return
+
+		self.offset += len(data)
+		self.tail = (self.tail + data)[-self.TAIL_SIZE:]
+		self.parser.feed(data)
+
+		parser = self.parser
+		counts = (
+			len(parser.errors), len(parser.warnings), len(parser.badboxes))
+		if counts != self.counts and not self._stopped.is_set():
+			self.counts = counts
+			self.on_update(
+				list(parser.errors), list(parser.warnings),
+				list(parser.badboxes))
+
+	def _same_tail(self, f):
+		if not self.tail:
+			return True
+		f.seek(self.offset - len(self.tail))
+		return f.read(len(self.tail)) == self.tail
+
+
 # Actual Command
 
 class make_pdfCommand(sublime_plugin.WindowCommand):
@@ -586,10 +702,17 @@ class make_pdfCommand(sublime_plugin.WindowCommand):
 
 		view = self.view = self.window.active_view()
 
+		# errors already shown while building
+		self.live_errors = []
+		self.build_finished = False
+
 		if _HAS_PHANTOMS:
 			self.hide_phantoms()
 			pref_settings = sublime.load_settings("Preferences.sublime-settings")
 			self.show_errors_inline = pref_settings.get("show_errors_inline", True)
+			self.errors = []
+			self.warnings = []
+			self.badboxes = []
 
 		if view.is_dirty():
 			print ("saving...")
@@ -658,6 +781,10 @@ class make_pdfCommand(sublime_plugin.WindowCommand):
 		platform_settings = get_setting(self.plat, {}, view=view)
 		self.display_bad_boxes = get_setting(
 			"display_bad_boxes", False, view=view)
+		self.parse_log_during_build = get_setting(
+			"parse_log_during_build", True, view=view)
+		self.use_recorder_file = get_setting(
+			"parse_log_with_recorder_file", True, view=view)
 
 		if builder is not None:
 			builder_name = builder
@@ -796,6 +923,27 @@ class make_pdfCommand(sublime_plugin.WindowCommand):
 		)
 
 
+	# Called from the LogWatcher while the build is running. Only errors are
+	# shown right away: the warnings of a run are often resolved by the next
+	# one, e.g. undefined references
+	def on_log_update(self, errors, warnings, badboxes):
+		new_errors = [e for e in errors if e not in self.live_errors]
+		if not new_errors:
+			return
+
+		self.live_errors.extend(new_errors)
+		self.show_output_panel()
+		self.output(
+			["", "Errors (the build is still running, build again to stop it):", ""] +
+			new_errors + [""]
+		)
+
+		if _HAS_PHANTOMS:
+			sublime.set_timeout(
+				functools.partial(self.show_live_errors, list(self.live_errors)),
+				0
+			)
+
 	# Threading headaches :-)
 	# The following function is what gets called from CmdThread; in turn,
 	# this spawns append_data, but on the main thread.
@@ -858,6 +1006,7 @@ class make_pdfCommand(sublime_plugin.WindowCommand):
 		sublime.set_timeout(functools.partial(self.do_finish, can_switch_to_pdf), 0)
 
 	def do_finish(self, can_switch_to_pdf):
+		self.build_finished = True
 		self.output_view.run_command("do_finish_edit")
 
 		if _HAS_PHANTOMS and self.show_errors_inline:
@@ -911,7 +1060,15 @@ class make_pdfCommand(sublime_plugin.WindowCommand):
 					self.errs_by_file[file] = []
 				self.errs_by_file[file].append((line, column, text, error_class))
 
-		def create_errs_by_file(self):
+		def show_live_errors(self, errors):
+			# the build may have finished in the meantime
+			if self.build_finished or not self.show_errors_inline:
+				return
+			self.create_errs_by_file(errors)
+			self.update_phantoms()
+
+		# if errors is given, only those are shown, e.g. while building
+		def create_errs_by_file(self, errors=None):
 			file_regex = self.output_view.settings().get("result_file_regex")
 			if not file_regex:
 				return
@@ -930,6 +1087,11 @@ class make_pdfCommand(sublime_plugin.WindowCommand):
 				"badboxes": 3
 			}.get(level_name, 2)
 
+			if errors is not None:
+				if level >= 1:
+					self._find_errors(errors, "error")
+				return
+
 			if level >= 1:
 				self._find_errors(self.errors, "error")
 			if level >= 2:
@@ -1,6 +1,7 @@
 # ST2/ST3 compat
 from __future__ import print_function 
 
+import errno
 import re
 import sys
 import os.path
@@ -107,32 +108,207 @@ def debug_skip_file(f, root_dir):
 		return False
 
 
+# The recorder file (.fls) written by TeX if it is run with the -recorder
+# option (latexmk always does) lists every file TeX opened. If it is
+# available, parse_tex_log can check whether a candidate file name is really
+# a file using the set of recorded inputs, rather than the filesystem. This
+# is both faster for large logs and more reliable, as names which happen
+# to exist but were never read by TeX are not mistaken for files.
+
+# A recorder file older than the log by more than this many seconds is
+# assumed to be left over from a build without -recorder
+FLS_MAX_AGE = 60
+
+# Input: recorder file, read in binary form; directory to resolve relative
+# paths against if the file does not record the working directory
+# Output: set of normalized paths of all files read by TeX
+def parse_fls(data, root_dir):
+	recorded_files = set()
+	pwd = root_dir
+	for l in data.splitlines():
+		l = l.decode('UTF-8', 'ignore')
+		if l.startswith("PWD "):
+			pwd = l[4:]
+		elif l.startswith("INPUT "):
+			recorded_files.add(normalize_recorded_path(
+				os.path.join(pwd, l[6:])))
+	return recorded_files
+
+
+# Reads the recorder file fls_file if it belongs to the same run as log_file
+# Output: set of recorded inputs as returned by parse_fls or None if there is
+# no usable recorder file
+def read_fls_file(fls_file, root_dir, log_file=None):
+	try:
+		if log_file is not None and \
+		   os.path.getmtime(fls_file) < os.path.getmtime(log_file) - FLS_MAX_AGE:
+			debug("Ignoring outdated recorder file " + fls_file)
+			return None
+		with open(fls_file, 'rb') as f:
+			data = f.read()
+	except (IOError, OSError):
+		return None
+
+	debug("Using recorder file " + fls_file)
+	return parse_fls(data, root_dir)
+
+
+def normalize_recorded_path(f):
+	return os.path.normcase(os.path.normpath(f))
+
+
+# Returns a function checking whether a path is a file, which caches its
+# results, as the same candidates come up again and again in a log. Rather
+# than calling isfile on every candidate, the directory of each candidate is
+# listed once: names which are not in the listing, i.e., most of the text
+# which merely looks like a file name, cost no isfile call at all.
+# As the log may be parsed while TeX is still writing files, a listing is
+# taken again if a name is not found and the directory was modified since;
+# only files found are cached for the same reason.
+def make_file_checker():
+	# directory -> (modification time, lowercase names or None)
+	listings = {}
+	found = set()
+
+	def list_dir(d, refresh=False):
+		listing = listings.get(d)
+		if listing is not None and not refresh:
+			return listing[1]
+		try:
+			mtime = os.stat(d).st_mtime
+		except OSError:
+			mtime = None
+		if listing is not None and listing[0] == mtime:
+			return listing[1]
+		try:
+			# the file system may be case-insensitive
+			names = set(n.lower() for n in os.listdir(d))
+		except OSError as e:
+			# if we may not list the directory, we have to check each file
+			names = None if e.errno == errno.EACCES else set()
+		except UnicodeError:
+			names = None
+		listings[d] = (mtime, names)
+		return names
+
+	def is_file(f):
+		if f in found:
+			return True
+		d, name = os.path.split(f)
+		d = d or os.curdir
+		names = list_dir(d)
+		if names is not None and name.lower() not in names:
+			names = list_dir(d, refresh=True)
+		if names is None or name.lower() in names:
+			result = os.path.isfile(f)
+		else:
+			# non-ASCII names may be normalized differently in the listing
+			# and the 8.3 short names on Windows are not listed at all
+			result = (
+				not _is_ascii(name) or
+				(os.name == 'nt' and '~' in name)
+			) and os.path.isfile(f)
+		if result:
+			found.add(f)
+		return result
+
+	return is_file
+
+
+def _is_ascii(s):
+	try:
+		s.encode('ascii')
+		return True
+	except UnicodeError:
+		return False
+
+
 # More robust parsing code: October / November 2012
-# Input: tex log file, read in **binary** form, unprocessed
+# Input: tex log file, read in **binary** form, unprocessed; optionally, the
+# recorded inputs of the run as returned by parse_fls / read_fls_file
 # Output: content to be displayed in output panel, split into lines
 
-def parse_tex_log(data, root_dir):
-	debug("Parsing log file")
-	errors = []
-	warnings = []
-	badboxes = []
-	parsing = []
+def parse_tex_log(data, root_dir, recorded_files=None):
+	parser = TeXLogParser(root_dir, recorded_files)
+	parser.feed(data)
+	return parser.close()
+
+
+# Incremental parser: the log can be fed in chunks of bytes as TeX writes it,
+# e.g. while tailing the log during the build; errors, warnings and badboxes
+# are the messages found so far. close() must be called at the end of the
+# log, as the last messages are only complete then.
+class TeXLogParser(object):
+
+	def __init__(self, root_dir, recorded_files=None):
+		self.errors = []
+		self.warnings = []
+		self.badboxes = []
+		self.done = False
+		# the last, incomplete line of the data fed so far
+		self._pending = b""
+		self._parser = _parse_log_lines(
+			root_dir, recorded_files, self.errors, self.warnings, self.badboxes)
+		# run up to the point where the first line is read
+		advance_iterator(self._parser)
+
+	def feed(self, data):
+		# Split data into lines while in binary form, keeping the line
+		# endings, so we know whether the last line is complete. We also wait
+		# for the rest of a line ending in \r, which may be followed by \n
+		lines = (self._pending + data).splitlines(True)
+		if lines and lines[-1][-1:] != b"\n":
+			self._pending = lines.pop()
+		else:
+			self._pending = b""
 
-	guessed_encoding = 'UTF-8' # for now
+		for l in lines:
+			self._send_line(l.rstrip(b"\r\n"))
 
-	# Split data into lines while in binary form
-	# Then decode using guessed encoding
-	# We need the # of bytes per line, not the # of chars (codepoints), to undo TeX's line breaking
-	# so we construct an array of tuples:
-	#   (decoded line, length of original byte array)
+	def close(self):
+		if self._pending:
+			self._send_line(self._pending.rstrip(b"\r\n"))
+			self._pending = b""
+
+		# the parser may ask for further lines until it notices the end
+		while not self.done:
+			self._send(None)
+
+		return (self.errors, self.warnings, self.badboxes)
+
+	def _send_line(self, l):
+		# Decode using guessed encoding
+		# We need the # of bytes per line, not the # of chars (codepoints), to undo TeX's line breaking
+		# so we pass tuples:
+		#   (decoded line, length of original byte array)
+		self._send((l.decode('UTF-8', 'ignore'), len(l)))
+
+	def _send(self, line):
+		if self.done:
+			return
+		try:
+			self._parser.send(line)
+		except StopIteration:
+			self.done = True
+
+
+# Raised in the parser when there are no more lines in the log
+class _EndOfLog(Exception):
+	pass
 
-	try:
-		log = [(l.decode(guessed_encoding, 'ignore'), len(l))  for l in data.splitlines()]
-	except UnicodeError:
-		debug("log file not in UTF-8 encoding!")
-		errors.append("ERROR: your log file is not in UTF-8 encoding.")
-		errors.append("Sorry, I can't process this file")
-		return (errors, warnings, badboxes)
+
+def _line_or_end(line):
+	if line is None:
+		raise _EndOfLog()
+	return line
+
+
+# The parser itself: a generator which receives each line of the log, as a
+# tuple of the decoded line and its length in bytes, at each (yield) and
+# None once the log ends; the messages are appended to the lists passed in
+def _parse_log_lines(root_dir, recorded_files, errors, warnings, badboxes):
+	debug("Parsing log file")
+	parsing = []
 
 	# loop over all log lines; construct error message as needed
 	# This will be useful for multi-file documents
@@ -154,7 +330,7 @@ def parse_tex_log(data, root_dir):
 	# 1. we capture the initial and ending " if there is one; we'll need to remove it later
 	# 2. we define the basic filename parsing regex so we can recycle it
 	# 3. we allow for any character besides "(" before a file name starts. This gives a lot of 
-	#	 false positives but we kill them with os.path.isfile
+	#	 false positives but we kill them with skip_file
 	file_basic = r"\"?(?:[a-zA-Z]\:)?(?:\.|(?:\.\./)|(?:\.\.\\))*.+?\.[^\s\"\)\.]+\"?"
 	file_rx = re.compile(r"[^\(]*?\((" + file_basic + r")(\s|\"|\)|$)(.*)")
 	# Useless file #1: {filename.ext}; capture subsequent text
@@ -183,6 +359,24 @@ def parse_tex_log(data, root_dir):
 	# Special case: the comment package, which prints ")" after some text
 	comment_rx = re.compile(r"Excluding comment '.*?'(.*)")
 
+	# Candidate file names are checked against the recorder file if we have
+	# one, otherwise against the filesystem
+	if recorded_files is None:
+		is_file = make_file_checker()
+	else:
+		def is_file(f):
+			return normalize_recorded_path(f) in recorded_files
+
+	# Should the candidate be skipped, i.e., is it not a file? As we may ask
+	# the user when debugging, only decide once for each candidate
+	skipped = {}
+	def skip_file(f):
+		try:
+			return skipped[f]
+		except KeyError:
+			skip = skipped[f] = (not is_file(f)) and debug_skip_file(f, root_dir)
+			return skip
+
 	files = []
 	xypic_flag = False # If we have seen xypic, report a warning, not an error for incorrect parsing
 
@@ -228,8 +422,7 @@ def parse_tex_log(data, root_dir):
 	
 	state = STATE_NORMAL
 
-	# Use our own iterator instead of for loop
-	log_iterator = log.__iter__()
+	# Lines are read using (yield), so we can be resumed once TeX wrote more
 	line_num = 0
 	line = ""
 	linelen = 0
@@ -251,9 +444,9 @@ def parse_tex_log(data, root_dir):
 			# save previous line for "! File ended while scanning use of..." message
 			prev_line = line
 			try:
-				line, linelen = advance_iterator(log_iterator) # will fail when no more lines
+				line, linelen = _line_or_end((yield)) # will fail when no more lines
 				line_num += 1
-			except StopIteration:
+			except _EndOfLog:
 				break
 		# Now we deal with TeX's decision to truncate all log lines at 79 characters
 		# If we find a line of exactly 79 characters, we add the subsequent line to it, and continue
@@ -306,7 +499,7 @@ def parse_tex_log(data, root_dir):
 					debug("only one quote, extending")
 				# Now we have a long line consisting of a potential file name alone
 				# Check if it really is a file name
-				elif (not os.path.isfile(file_name)) and debug_skip_file(file_name, root_dir):
+				elif skip_file(file_name):
 					debug("Not a file name")
 				else:
 					debug("IT'S A (LONG) FILE NAME WITH NO EXTRA TEXT")
@@ -315,8 +508,7 @@ def parse_tex_log(data, root_dir):
 			while extend_line:
 				debug("extending: " + line)
 				try:
-					# different handling for Python 2 and 3
-					extra, extralen = advance_iterator(log_iterator)
+					extra, extralen = _line_or_end((yield))
 					debug("extension? " + extra)
 					line_num += 1 # for debugging purposes
 					# HEURISTIC: if extra line begins with "Package:" "File:" "Document Class:",
@@ -346,7 +538,7 @@ def parse_tex_log(data, root_dir):
 					# valid file, this likely starts something else we need to
 					# process as a file, so add a space...
 					elif extralen > 0 and extra[0] == '(' and (
-						os.path.isfile(file_name) or not debug_skip_file(file_name, root_dir)
+						not skip_file(file_name)
 					):
 						line += " " + extra
 						debug("Extended: " + line)
@@ -359,7 +551,7 @@ def parse_tex_log(data, root_dir):
 						linelen += extralen
 						if extralen < 79:
 							extend_line = False
-				except StopIteration:
+				except _EndOfLog:
 					extend_line = False # end of file, so we must be done. This shouldn't happen, btw
 
 		# NOW WE GOT OUR EXTENDED LINE, SO START PROCESSING
@@ -445,9 +637,9 @@ def parse_tex_log(data, root_dir):
 		if "! File ended while scanning use of" in line:
 			scanned_command = line[35:-2] # skip space and period at end
 			# we may be unable to report a file by popping it, so HACK HACK HACK
-			file_name, linelen = advance_iterator(log_iterator) # <inserted text>
-			file_name, linelen = advance_iterator(log_iterator) #      \par
-			file_name, linelen = advance_iterator(log_iterator)
+			file_name, linelen = _line_or_end((yield)) # <inserted text>
+			file_name, linelen = _line_or_end((yield)) #      \par
+			file_name, linelen = _line_or_end((yield))
 			file_name = file_name[3:] # here is the file name with <*> in front
 			errors.append("TeX STOPPED: " + line[2:-2]+prev_line[:-5])
 			errors.append("TeX reports the error was in file:" + file_name)
@@ -489,9 +681,9 @@ def parse_tex_log(data, root_dir):
 			ou_processing = True
 			while ou_processing:
 				try:
-					line, linelen = advance_iterator(log_iterator) # will fail when no more lines
-				except StopIteration:
-					debug("Over/underfull: StopIteration (%d)" % line_num)
+					line, linelen = _line_or_end((yield)) # will fail when no more lines
+				except _EndOfLog:
+					debug("Over/underfull: end of log (%d)" % line_num)
 					break
 				line_num += 1
 				debug("Over/underfull: skip " + line + " (%d) " % line_num)
@@ -630,7 +822,7 @@ def parse_tex_log(data, root_dir):
 
 		# Now we should have a candidate file. We still have an issue with lines that
 		# look like file names, e.g. "(Font)     blah blah data 2012.10.3" but those will
-		# get killed by the isfile call. Not very efficient, but OK in practice
+		# get killed by the skip_file call. Not very efficient, but OK in practice
 		debug("FILE? Line:" + line)
 		file_match = file_rx.match(line)
 		if file_match:
@@ -657,7 +849,7 @@ def parse_tex_log(data, root_dir):
 				file_name = file_name[:-6]
 				extra = "pdfTeX" + extra
 			# This kills off stupid matches
-			if (not os.path.isfile(file_name)) and debug_skip_file(file_name, root_dir):
+			if skip_file(file_name):
 				#continue
 				# NOTE BIG CHANGE HERE: CONTINUE PROCESSING IF NO MATCH
 				pass
@@ -739,7 +931,6 @@ def parse_tex_log(data, root_dir):
 		print_debug = True
 		for l in parsing:
 			debug(l)
-	return (errors, warnings, badboxes)
 
 
 # If invoked from the command line, parse provided log file
@@ -753,7 +944,10 @@ if __name__ == '__main__':
 			extra_file_ext = sys.argv[2].split(" ")
 		data = open(logfilename, 'rb').read()
 		root_dir = os.path.dirname(logfilename)
-		errors, warnings, badboxes = parse_tex_log(data, logfilename)
+		recorded_files = read_fls_file(
+			os.path.splitext(logfilename)[0] + ".fls", root_dir)
+		errors, warnings, badboxes = parse_tex_log(
+			data, logfilename, recorded_files)
 		print("")
 		print("Errors:")
 		for err in errors:
@@ -38,6 +38,7 @@ try:
     from latextools_utils.utils import run_on_main_thread
     from jumpToPDF import DEFAULT_VIEWERS
     from getTeXRoot import get_tex_root
+    from kpsewhich import kpsewhich_many
 except ImportError:
     from .latextools_plugin import (
         add_plugin_path, get_plugin, NoSuchPluginException,
@@ -56,6 +57,7 @@ except ImportError:
     from .latextools_utils.utils import run_on_main_thread
     from .jumpToPDF import DEFAULT_VIEWERS
     from .getTeXRoot import get_tex_root
+    from .kpsewhich import kpsewhich_many
 
 _HAS_PREVIEW = sublime.version() >= '3118'
 if _HAS_PREVIEW:
@@ -283,13 +285,6 @@ def get_tex_path_variable_miktex(variable, env=None):
         return None
 
 
-def kpsewhich(file):
-    try:
-        return check_output(['kpsewhich', file])
-    except Exception:
-        return None
-
-
 def get_max_width(table, column):
     return max(len(unicode(row[column])) for row in table)
 
@@ -558,8 +553,11 @@ class SystemCheckThread(threading.Thread):
             if packages:
                 table = [[u'Packages for equation preview', u'Status']]
 
+                # the cached results may be outdated, e.g. if packages were
+                # installed or removed since
+                resolved = kpsewhich_many(packages, use_cache=False)
                 for package in packages:
-                    available = kpsewhich(package) is not None
+                    available = resolved.get(package) is not None
                     package_name = package.split(".")[0]
                     table.append([
                         package_name,
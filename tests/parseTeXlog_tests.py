@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import parseTeXlog
+
+# a file name which fills the first line of the log exactly, so that the line
+# is continued on the next one
+LONG_NAME = 'chapters/' + 'x' * 71 + '.tex'
+
+FILES = [
+    'main.tex', 'main.aux', 'style/mystyle.sty', 'chapters/intro.tex',
+    LONG_NAME
+]
+
+LOG_LINES = [
+    u'This is pdfTeX, Version 3.14159265-2.6-1.40.18 (TeX Live 2017) '
+    u'(preloaded format=pdflatex 2017.5.1)  1 JAN 2018 12:00',
+    u'entering extended mode',
+    u'**main.tex',
+    u'(./main.tex',
+    u'LaTeX2e <2017-04-15>',
+    u'(./style/mystyle.sty',
+    u'Package: mystyle 2018/01/01 test style',
+    u')',
+    u'(./chapters/intro.tex',
+    u"LaTeX Warning: Reference `fig:one' on page 1 undefined on input "
+    u"line 12.",
+    u'',
+    u'! Undefined control sequence.',
+    u'l.15 \\foo',
+    u'          bar',
+    u'',
+    u'Overfull \\hbox (12.3pt too wide) in paragraph at lines 20--22',
+    u'[]\\OT1/cmr/m/n/10 Some text',
+    u' []',
+    u'',
+    u')',
+    (u'(./' + LONG_NAME)[:79],
+    (u'(./' + LONG_NAME)[79:],
+    u'Package hyperref Warning: Token not allowed in a PDF string '
+    u'(PDFDocEncoding):',
+    u"(hyperref)                removing `\\foo' on input line 30.",
+    u'',
+    u')',
+    u'[1{/usr/local/texlive/2017/texmf-var/fonts/map/pdftex/updmap/'
+    u'pdftex.map}]',
+    u'Underfull \\hbox (badness 10000) in paragraph at lines 40--41',
+    u'[]\\OT1/cmr/m/n/10 a',
+    u' []',
+    u'',
+    u'(./main.aux) )',
+    u"Here is how much of TeX's memory you used:",
+    u' 1000 strings out of 492995',
+    u'Output written on main.pdf (1 page, 1234 bytes).',
+]
+
+
+def make_log(newline=u'\n'):
+    return (newline.join(LOG_LINES) + newline).encode('utf-8')
+
+
+class TestParseTeXLog(unittest.TestCase):
+
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        for f in FILES:
+            path = os.path.join(self.root_dir, *f.split('/'))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def path(self, f):
+        return os.path.join(self.root_dir, *f.split('/'))
+
+    def expected(self):
+        # the messages reported by the parser before it was made incremental
+        intro = self.path('chapters/intro.tex')
+        return (
+            [
+                intro + u':15: Undefined control sequence. [\\foo]'
+            ],
+            [
+                intro + u":12: LaTeX Warning: Reference `fig:one' on page "
+                u"1 undefined on input line 12.",
+                self.path(LONG_NAME) + u':30: Package hyperref Warning: '
+                u'Token not allowed in a PDF string (PDFDocEncoding):'
+                u"(hyperref)                removing `\\foo' on input "
+                u"line 30."
+            ],
+            [
+                intro + u':20: Overfull \\hbox (12.3pt too wide) in '
+                u'paragraph at lines 20--22[]\\OT1/cmr/m/n/10 Some text',
+                self.path('main.tex') + u':40: Underfull \\hbox (badness '
+                u'10000) in paragraph at lines 40--41[]\\OT1/cmr/m/n/10 a'
+            ]
+        )
+
+    def feed_chunks(self, data, size):
+        parser = parseTeXlog.TeXLogParser(self.root_dir)
+        for i in range(0, len(data), size):
+            parser.feed(data[i:i + size])
+        return parser.close()
+
+    def test_parse_tex_log(self):
+        self.assertEqual(
+            parseTeXlog.parse_tex_log(make_log(), self.root_dir),
+            self.expected()
+        )
+
+    def test_crlf(self):
+        self.assertEqual(
+            parseTeXlog.parse_tex_log(make_log(u'\r\n'), self.root_dir),
+            self.expected()
+        )
+
+    def test_chunks(self):
+        for newline in (u'\n', u'\r\n'):
+            data = make_log(newline)
+            for size in (1, 2, 7, 79, 80, 1024):
+                self.assertEqual(
+                    self.feed_chunks(data, size), self.expected(),
+                    'chunks of {0} bytes'.format(size)
+                )
+
+    def test_messages_while_feeding(self):
+        parser = parseTeXlog.TeXLogParser(self.root_dir)
+        data = make_log()
+        error_end = data.index(b'l.15')
+        parser.feed(data[:error_end])
+        self.assertEqual(parser.errors, [])
+        parser.feed(data[error_end:])
+        self.assertEqual(len(parser.errors), 1)
+
+    def test_recorded_files(self):
+        recorded_files = set(
+            parseTeXlog.normalize_recorded_path(self.path(f)) for f in FILES
+        )
+        self.assertEqual(
+            parseTeXlog.parse_tex_log(
+                make_log(), self.root_dir, recorded_files),
+            self.expected()
+        )
+
+    def test_file_written_after_listing(self):
+        is_file = parseTeXlog.make_file_checker()
+        new_file = self.path('chapters/new.tex')
+        self.assertFalse(is_file(new_file))
+
+        open(new_file, 'w').close()
+        # make sure the modification is noticed on a coarse file system
+        directory = os.path.dirname(new_file)
+        mtime = os.stat(directory).st_mtime + 10
+        os.utime(directory, (mtime, mtime))
+        self.assertTrue(is_file(new_file))
+
+
+if __name__ == '__main__':
+    unittest.main()